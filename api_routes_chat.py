@@ -12,6 +12,7 @@ from services.chat_service import ChatService
 from services.agent_orchestrator import AgentOrchestrator, AgentType
 from services.llm_registry import LLMRegistry
 from database_models import ConversationThread, ConversationMessage, LLMAPIKey
+from utils.websocket_manager import send_json
 from datetime import datetime
 import json
 import asyncio
@@ -482,17 +483,17 @@ async def websocket_chat(websocket: WebSocket, thread_id: str, db: Session = Dep
                     user_message=message,
                     temperature=temperature
                 ):
-                    await websocket.send_json({
+                    await send_json(websocket, {
                         'type': 'chunk',
                         'content': chunk
                     })
                 
                 # Send completion signal
-                await websocket.send_json({
+                await send_json(websocket, {
                     'type': 'done'
                 })
             except Exception as e:
-                await websocket.send_json({
+                await send_json(websocket, {
                     'type': 'error',
                     'error': str(e)
                 })
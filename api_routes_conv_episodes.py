@@ -214,10 +214,10 @@ async def create_conversational_episode(
             mode=workflow.mode,
             style=workflow.style,
             step_info=workflow.get_current_step_info(),
-            outline=workflow.outline.dict() if workflow.outline else None,
-            characters=[c.dict() for c in workflow.characters],
-            scenes=[s.dict() for s in workflow.scenes],
-            storyboard=[shot.dict() for shot in workflow.storyboard],
+            outline=workflow.outline.model_dump() if workflow.outline else None,
+            characters=[c.model_dump() for c in workflow.characters],
+            scenes=[s.model_dump() for s in workflow.scenes],
+            storyboard=[shot.model_dump() for shot in workflow.storyboard],
             error=workflow.error
         )
         
@@ -263,7 +263,7 @@ async def get_workflow_state(
                 "style": session.style,
                 "context": session.context or {},
             })
-            workflow_manager.workflows[workflow.episode_id] = workflow
+            workflow_manager.add_workflow(workflow)
         
         # Get outline from database
         outline_data = None
@@ -81,10 +81,7 @@ async def websocket_endpoint(
                     })
                 
                 elif action == "ping":
-                    await ws_manager.send_personal_message(client_id, {
-                        "type": "info",
-                        "message": "pong"
-                    })
+                    await ws_manager.send_pong(client_id)
                 
                 else:
                     await ws_manager.send_personal_message(client_id, {
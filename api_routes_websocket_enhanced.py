@@ -134,7 +134,7 @@ async def workflow_progress_stream(
         ws_manager.disconnect(client_id)
         
         # Unsubscribe if no more clients in room
-        if not ws_manager.get_room_clients(room):
+        if not ws_manager.get_room_size(room):
             progress_broadcaster.unsubscribe_from_workflow(workflow_id)
 
 
@@ -219,7 +219,7 @@ async def agent_status_stream(
         ws_manager.disconnect(client_id)
         
         # Unsubscribe if no more clients in room
-        if not ws_manager.get_room_clients(room):
+        if not ws_manager.get_room_size(room):
             progress_broadcaster.unsubscribe_from_agent(agent_name, room)
 
 
@@ -55,15 +55,24 @@ from api_routes_segment_review import router as segment_review_router
 from api_routes_compilation import router as compilation_router
 
 from database import init_db
+from utils.websocket_manager import ws_manager
+from utils.video import close_download_session
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     print("Starting ViMax API Server...")
+    # uvicorn默认loop="auto", 安装了uvloop时自动使用
+    print(f"Event loop: {type(asyncio.get_running_loop()).__module__}")
     init_db()
     print("Database initialized")
+    # 多worker部署时设置WS_REDIS_URL, WebSocket消息经Redis pub/sub跨进程扇出
+    if await ws_manager.start_redis(os.getenv("WS_REDIS_URL")):
+        print("WebSocket Redis pub/sub enabled")
     yield
+    await ws_manager.stop_redis()
+    await close_download_session()
     print("Shutting down ViMax API Server...")
 
 
@@ -1327,4 +1336,5 @@ async def extract_characters_from_script(script: str):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=3001)
\ No newline at end of file
+    # WebSocket广播对所有客户端发送同一帧, 关闭permessage-deflate避免逐客户端重复压缩
+    uvicorn.run(app, host="0.0.0.0", port=3001, ws_per_message_deflate=False)
\ No newline at end of file
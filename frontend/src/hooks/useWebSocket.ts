@@ -147,24 +147,30 @@ export function useWebSocket(options: UseWebSocketOptions): UseWebSocketReturn {
       };
 
       ws.onmessage = (event) => {
-        try {
-          const message: WebSocketMessage = JSON.parse(event.data);
-          
-          // Handle pong response
-          if (message.type === 'pong') {
-            return;
-          }
-          
-          // Call global message handler
-          onMessage?.(message);
-          
-          // Call type-specific subscribers
-          const subscribers = subscribersRef.current.get(message.type);
-          if (subscribers) {
-            subscribers.forEach(handler => handler(message));
+        // A frame may carry several newline-delimited messages when the
+        // server batches topic updates
+        const lines: string[] = String(event.data).split('\n');
+        
+        for (const line of lines) {
+          try {
+            const message: WebSocketMessage = JSON.parse(line);
+            
+            // Handle pong response
+            if (message.type === 'pong') {
+              continue;
+            }
+            
+            // Call global message handler
+            onMessage?.(message);
+            
+            // Call type-specific subscribers
+            const subscribers = subscribersRef.current.get(message.type);
+            if (subscribers) {
+              subscribers.forEach(handler => handler(message));
+            }
+          } catch (error) {
+            console.error('[WebSocket] Error parsing message:', error);
           }
-        } catch (error) {
-          console.error('[WebSocket] Error parsing message:', error);
         }
       };
 
@@ -25,7 +25,7 @@ fi
 
 # Start server in background
 echo "Starting server on http://localhost:3001..."
-nohup uvicorn api_server:app --host 0.0.0.0 --port 3001 >> server.log 2>&1 &
+nohup uvicorn api_server:app --host 0.0.0.0 --port 3001 --ws-per-message-deflate false >> server.log 2>&1 &
 
 # Wait for server to start
 sleep 3
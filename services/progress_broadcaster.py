@@ -5,11 +5,10 @@ Bridges A2A Coordinator events to WebSocket clients
 Part of Week 3: Frontend WebSocket Integration - Phase 1
 """
 
-from typing import Dict, Any, Optional, Callable, Set
+from typing import Dict, Any, Optional, Callable, Set, Deque
 from datetime import datetime
-import asyncio
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from utils.websocket_manager import WebSocketManager, ws_manager
 
@@ -42,8 +41,9 @@ class ProgressBroadcaster:
         # Coordinator room (for global metrics)
         self.coordinator_room = "coordinator_metrics"
         
-        # Message buffer for disconnected clients: {room: List[message]}
-        self.message_buffer: Dict[str, list] = defaultdict(list)
+        # Message buffer for disconnected clients: {room: Deque[message]}
+        # (bounded deque, oldest messages fall off without reallocating)
+        self.message_buffer: Dict[str, Deque[Dict[str, Any]]] = {}
         self.max_buffer_size = 50
         
         logger.info("Progress Broadcaster initialized")
@@ -271,10 +271,11 @@ class ProgressBroadcaster:
             message: Message to broadcast
         """
         try:
-            # Get clients in room
-            clients = self.ws_manager.get_room_clients(room)
+            # Room size comes from a counter, no copy of the member set per message
+            client_count = self.ws_manager.get_room_size(room)
             
-            if not clients:
+            # With a remote backend the room may have members on other workers
+            if not client_count and not self.ws_manager.has_remote_backend():
                 # No clients, buffer the message
                 self._buffer_message(room, message)
                 logger.debug(f"No clients in room '{room}', message buffered")
@@ -282,7 +283,7 @@ class ProgressBroadcaster:
             
             # Broadcast to room
             await self.ws_manager.broadcast_to_room(room, message)
-            logger.debug(f"Broadcasted message to room '{room}' ({len(clients)} clients)")
+            logger.debug(f"Broadcasted message to room '{room}' ({client_count} clients)")
         
         except Exception as e:
             logger.error(f"Error broadcasting to room '{room}': {e}")
@@ -295,11 +296,11 @@ class ProgressBroadcaster:
             room: Room name
             message: Message to buffer
         """
-        self.message_buffer[room].append(message)
+        buffer = self.message_buffer.get(room)
+        if buffer is None:
+            buffer = self.message_buffer[room] = deque(maxlen=self.max_buffer_size)
         
-        # Limit buffer size
-        if len(self.message_buffer[room]) > self.max_buffer_size:
-            self.message_buffer[room] = self.message_buffer[room][-self.max_buffer_size:]
+        buffer.append(message)
     
     async def send_buffered_messages(self, room: str, client_id: str):
         """
@@ -312,16 +313,18 @@ class ProgressBroadcaster:
         if room not in self.message_buffer:
             return
         
-        messages = self.message_buffer[room]
+        # Snapshot: new messages may be buffered while we are sending
+        messages = list(self.message_buffer[room])
         if not messages:
             return
         
         logger.info(f"Sending {len(messages)} buffered messages to client {client_id}")
         
         try:
+            # No per-message sleep: messages go onto the client's bounded send
+            # queue and its writer task is paced by the socket itself
             for message in messages:
                 await self.ws_manager.send_personal_message(client_id, message)
-                await asyncio.sleep(0.01)  # Avoid flooding
         
         except Exception as e:
             logger.error(f"Error sending buffered messages to {client_id}: {e}")
@@ -60,4 +60,4 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-uvicorn api_server:app --host 0.0.0.0 --port 3001 --reload
\ No newline at end of file
+uvicorn api_server:app --host 0.0.0.0 --port 3001 --reload --ws-per-message-deflate false
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+IdeaGuidedWorkflow Progress Tests
+
+Tests the background progress dispatcher: delivery order and that no
+dispatcher task outlives a run, on success and on failure. The chat model
+is a stub that answers every prompt with an empty JSON object.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from workflows.idea_guided_workflow import (
+    IdeaGuidedWorkflow,
+    IdeaInput,
+    WorkflowStage,
+)
+
+
+class FakeChatModel:
+    """Chat model stub, every stage parses "{}" into its defaults"""
+    
+    async def ainvoke(self, prompt):
+        return "{}"
+
+
+def dispatcher_tasks():
+    """Progress dispatcher tasks still pending on the loop"""
+    return [
+        task for task in asyncio.all_tasks()
+        if not task.done() and "_progress_dispatcher" in repr(task.get_coro())
+    ]
+
+
+@pytest.mark.unit
+class TestProgressDispatcher:
+    """Test IdeaGuidedWorkflow progress delivery"""
+    
+    @pytest.mark.asyncio
+    async def test_completed_run_stops_dispatcher(self, tmp_path):
+        """Test every stage is reported and the dispatcher exits afterwards"""
+        stages = []
+        
+        async def callback(stage, data):
+            stages.append(stage)
+        
+        workflow = IdeaGuidedWorkflow(FakeChatModel(), str(tmp_path), progress_callback=callback)
+        await workflow.start_from_idea(IdeaInput(core_concept="一个故事"))
+        
+        assert stages[0] == WorkflowStage.IDEA_INPUT
+        assert stages[-1] == WorkflowStage.SCRIPT_GENERATION
+        assert WorkflowStage.VISUAL_STYLE in stages
+        assert dispatcher_tasks() == []
+        assert workflow._progress_task is None
+    
+    @pytest.mark.asyncio
+    async def test_failed_run_stops_dispatcher(self, tmp_path):
+        """Test a failing stage cancels the dispatcher before the error propagates"""
+        never = asyncio.Event()
+        
+        async def callback(stage, data):
+            await never.wait()
+        
+        async def design_characters(expanded_idea):
+            raise RuntimeError("character design failed")
+        
+        workflow = IdeaGuidedWorkflow(FakeChatModel(), str(tmp_path), progress_callback=callback)
+        workflow.design_characters = design_characters
+        
+        with pytest.raises(RuntimeError, match="character design failed"):
+            await workflow.start_from_idea(IdeaInput(core_concept="一个故事"))
+        
+        assert dispatcher_tasks() == []
+        assert workflow._progress_task is None
+    
+    @pytest.mark.asyncio
+    async def test_dispatcher_restarts_after_draining(self, tmp_path):
+        """Test events reported after the queue drained are still delivered"""
+        stages = []
+        workflow = IdeaGuidedWorkflow(
+            FakeChatModel(), str(tmp_path), progress_callback=lambda stage, data: stages.append(stage)
+        )
+        
+        workflow._notify_progress(WorkflowStage.IDEA_INPUT, {})
+        await workflow._flush_progress()
+        assert dispatcher_tasks() == []
+        
+        workflow._notify_progress(WorkflowStage.IDEA_EXPANSION, {})
+        await workflow._flush_progress()
+        
+        assert stages == [WorkflowStage.IDEA_INPUT, WorkflowStage.IDEA_EXPANSION]
+        assert dispatcher_tasks() == []
@@ -0,0 +1,151 @@
+"""
+PipelineAdapter Streaming Tests
+
+Tests for run_pipeline_streaming: event order, early close by the caller
+and failure of one of the parallel stages. Pipeline stages are stubbed,
+no model or image API is called.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from workflows.pipeline_adapter import PipelineAdapter
+from workflows.conversational_episode_workflow import (
+    OutlineData,
+    CharacterData,
+    SceneData,
+    ShotData,
+)
+
+
+SCENE_COUNT = 5
+
+
+def make_adapter(characters_stage=None, scene_delay: float = 0.0, failing_scene: int = -1):
+    """Create an adapter whose pipeline stages are replaced by stubs"""
+    adapter = PipelineAdapter("configs/idea2video.yaml", mode="idea")
+    adapter.pipeline = object()
+    
+    async def generate_outline_from_idea(idea, style):
+        return OutlineData(
+            title="测试",
+            synopsis=idea,
+            plot_summary=[
+                {"act": f"场景 {i+1}", "description": "紧张的冲突" if i == 0 else "平常的一天"}
+                for i in range(SCENE_COUNT)
+            ],
+        )
+    
+    async def extract_and_generate_characters(content, style):
+        return [CharacterData(name="主角", description="", appearance="", role="protagonist")]
+    
+    async def generate_scene(i, scene_name, scene_desc, atmosphere, style):
+        await asyncio.sleep(scene_delay)
+        if i == failing_scene:
+            raise ValueError("scene failed")
+        return SceneData(
+            name=scene_name,
+            description=scene_desc,
+            atmosphere=atmosphere,
+            image_url=f"scene_{i+1}.png"
+        )
+    
+    async def generate_storyboard(outline, characters, scenes, style, script):
+        return [
+            ShotData(
+                shot_number=n + 1,
+                scene_name=scene.name,
+                visual_desc=scene.description,
+                camera_angle="中景",
+                camera_movement="稳定"
+            )
+            for n, scene in enumerate(scenes)
+        ]
+    
+    adapter.generate_outline_from_idea = generate_outline_from_idea
+    adapter.extract_and_generate_characters = characters_stage or extract_and_generate_characters
+    adapter._generate_scene = generate_scene
+    adapter.generate_storyboard = generate_storyboard
+    return adapter
+
+
+def pending_tasks():
+    """Tasks left on the loop apart from the running test"""
+    current = asyncio.current_task()
+    return [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+
+
+@pytest.mark.unit
+class TestRunPipelineStreaming:
+    """Test PipelineAdapter.run_pipeline_streaming"""
+    
+    @pytest.mark.asyncio
+    async def test_yields_all_stages(self):
+        """Test outline first, every character/scene event, then shots in scene order"""
+        adapter = make_adapter()
+        
+        events = [event async for event in adapter.run_pipeline_streaming("一个故事")]
+        stages = [stage for stage, _ in events]
+        
+        assert stages[0] == "outline"
+        assert stages.count("characters") == 1
+        assert stages.count("scene") == SCENE_COUNT
+        assert stages[-SCENE_COUNT:] == ["shot"] * SCENE_COUNT
+        
+        scenes = dict(item for stage, item in events if stage == "scene")
+        assert scenes[0].atmosphere == "紧张"
+        shots = [item for stage, item in events if stage == "shot"]
+        assert [shot.scene_name for shot in shots] == [f"场景 {i+1}" for i in range(SCENE_COUNT)]
+    
+    @pytest.mark.asyncio
+    async def test_failed_scene_is_replaced_by_placeholder(self):
+        """Test a failing scene yields a placeholder without an image"""
+        adapter = make_adapter(failing_scene=2)
+        
+        events = [event async for event in adapter.run_pipeline_streaming("一个故事")]
+        scenes = dict(item for stage, item in events if stage == "scene")
+        
+        assert len(scenes) == SCENE_COUNT
+        assert scenes[2].image_url is None
+        assert scenes[2].name == "场景 3"
+        assert all(scenes[i].image_url for i in scenes if i != 2)
+    
+    @pytest.mark.asyncio
+    async def test_early_close_cancels_producers(self):
+        """Test aclose() while producers are blocked on the full queue"""
+        never = asyncio.Event()
+        
+        async def hanging_characters(content, style):
+            await never.wait()
+        
+        adapter = make_adapter(characters_stage=hanging_characters)
+        stream = adapter.run_pipeline_streaming("一个故事")
+        
+        assert (await stream.__anext__())[0] == "outline"
+        assert (await stream.__anext__())[0] == "scene"
+        # 剩余场景多于队列容量, 场景阶段此时阻塞在put上
+        await asyncio.sleep(0.05)
+        
+        await asyncio.wait_for(stream.aclose(), timeout=1)
+        
+        assert pending_tasks() == []
+    
+    @pytest.mark.asyncio
+    async def test_failing_producer_raises_and_cancels_other_stage(self):
+        """Test an error in one stage surfaces to the caller and stops the other"""
+        async def failing_characters(content, style):
+            raise RuntimeError("character extraction failed")
+        
+        adapter = make_adapter(characters_stage=failing_characters, scene_delay=10)
+        
+        with pytest.raises(RuntimeError, match="character extraction failed"):
+            async def consume():
+                async for _ in adapter.run_pipeline_streaming("一个故事"):
+                    pass
+            await asyncio.wait_for(consume(), timeout=1)
+        
+        assert pending_tasks() == []
@@ -0,0 +1,152 @@
+"""
+Unit Tests for RetryHandler
+
+Tests circuit breaker rejection handling and the retry budget in
+isolation. Wrapped functions are plain sync callables, no API is called.
+"""
+
+import pytest
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.retry_handler import (
+    RetryHandler,
+    RetryConfig,
+    ErrorType,
+    ErrorClassifier,
+    CircuitOpenError,
+    CircuitState,
+)
+
+
+def make_handler(**overrides) -> RetryHandler:
+    """Create a handler that never sleeps between attempts"""
+    config = RetryConfig(
+        base_delay=0.0,
+        max_delay=0.0,
+        jitter=False,
+        log_retries=False,
+        **overrides
+    )
+    return RetryHandler(config=config, provider="test")
+
+
+def failing_call():
+    raise ConnectionError("connection reset by peer")
+
+
+def counting(func):
+    """Wrap func and count how many times it is called"""
+    def wrapper():
+        wrapper.calls += 1
+        return func()
+    wrapper.calls = 0
+    return wrapper
+
+
+@pytest.mark.unit
+class TestCircuitBreakerRejection:
+    """Test calls rejected by an OPEN circuit breaker"""
+    
+    def test_circuit_open_error_is_non_retriable(self):
+        """Test CircuitOpenError classifies as NON_RETRIABLE"""
+        error = CircuitOpenError("Circuit breaker OPEN for provider test")
+        
+        assert ErrorClassifier.classify(error) == ErrorType.NON_RETRIABLE
+    
+    def test_rejected_calls_do_not_extend_open_state(self):
+        """Test rejections neither count as failures nor keep the breaker OPEN"""
+        handler = make_handler(
+            max_retries=1,
+            circuit_breaker_threshold=2,
+            circuit_breaker_timeout=0.05
+        )
+        breaker = handler.circuit_breaker
+        call = handler(failing_call)
+        
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                call()
+        assert breaker.state == CircuitState.OPEN
+        opened_at = breaker.last_failure_time
+        
+        # Traffic keeps arriving while the breaker is OPEN
+        for _ in range(5):
+            with pytest.raises(CircuitOpenError):
+                call()
+        assert breaker.failure_count == 2
+        assert breaker.last_failure_time == opened_at
+        
+        time.sleep(0.06)
+        
+        assert handler(lambda: "ok")() == "ok"
+        assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.unit
+class TestRetryBudget:
+    """Test the token-bucket retry budget"""
+    
+    def test_drained_budget_stops_retries(self):
+        """Test retries stop once the bucket is empty"""
+        handler = make_handler(
+            max_retries=5,
+            retry_budget_max_tokens=2.0,
+            retry_budget_min_rps=0.0,
+            circuit_breaker_enabled=False
+        )
+        call = counting(failing_call)
+        
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        
+        # First attempt plus one retry per token
+        assert call.calls == 3
+        
+        call.calls = 0
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        assert call.calls == 1
+    
+    def test_successes_refill_budget(self):
+        """Test every success refunds retry_budget_ratio tokens"""
+        handler = make_handler(
+            max_retries=5,
+            retry_budget_max_tokens=2.0,
+            retry_budget_ratio=0.5,
+            retry_budget_min_rps=0.0,
+            circuit_breaker_enabled=False
+        )
+        call = counting(failing_call)
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        
+        for _ in range(2):
+            handler(lambda: "ok")()
+        
+        call.calls = 0
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        assert call.calls == 2
+    
+    def test_budget_refills_over_time(self):
+        """Test a drained budget recovers at retry_budget_min_rps without successes"""
+        handler = make_handler(
+            max_retries=5,
+            retry_budget_max_tokens=2.0,
+            retry_budget_min_rps=20.0,
+            circuit_breaker_enabled=False
+        )
+        call = counting(failing_call)
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        
+        time.sleep(0.1)
+        
+        call.calls = 0
+        with pytest.raises(ConnectionError):
+            handler(call)()
+        assert call.calls == 3
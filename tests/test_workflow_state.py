@@ -0,0 +1,160 @@
+"""
+Unit Tests for WorkflowState Persistence
+
+Tests the snapshot + delta log checkpointing of WorkflowState in a
+temporary working directory.
+"""
+
+import pytest
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import workflows.idea_guided_workflow as idea_guided_workflow
+from workflows.idea_guided_workflow import (
+    WorkflowState,
+    WorkflowStage,
+    STATE_FILE_NAME,
+    DELTA_LOG_NAME,
+    DELTA_COMPACT_EVERY,
+    _apply_writes,
+)
+
+
+def make_state() -> WorkflowState:
+    return WorkflowState(workflow_id="wf-test", current_stage=WorkflowStage.IDEA_INPUT)
+
+
+def apply_snapshot_only(state: WorkflowState, working_dir: str):
+    """Compact, but crash before the delta log is truncated"""
+    writes = state._plan_snapshot(working_dir, state.to_dict())
+    assert [os.path.basename(path) for path, _, _ in writes] == [STATE_FILE_NAME, DELTA_LOG_NAME]
+    _apply_writes(working_dir, writes[:1])
+
+
+def read_deltas(working_dir: str):
+    with open(os.path.join(working_dir, DELTA_LOG_NAME), 'rb') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.unit
+class TestLoadHeader:
+    """Test WorkflowState.load_header against load()"""
+    
+    def test_missing_state(self, tmp_path):
+        """Test None without a saved state"""
+        assert WorkflowState.load_header(str(tmp_path)) is None
+    
+    def test_header_follows_delta_log(self, tmp_path):
+        """Test current_stage comes from the newest delta"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        state.current_stage = WorkflowStage.CHARACTER_DESIGN
+        state.save(working_dir)
+        
+        header = WorkflowState.load_header(working_dir)
+        
+        assert header == {"workflow_id": "wf-test", "current_stage": WorkflowStage.CHARACTER_DESIGN}
+    
+    def test_header_skips_deltas_folded_into_snapshot(self, tmp_path):
+        """Test a stale delta log left by a failed truncation is ignored"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        state.current_stage = WorkflowStage.IDEA_EXPANSION
+        state.save(working_dir)
+        
+        state.current_stage = WorkflowStage.SCENE_BREAKDOWN
+        apply_snapshot_only(state, working_dir)
+        
+        assert WorkflowState.load(working_dir).current_stage == WorkflowStage.SCENE_BREAKDOWN
+        assert WorkflowState.load_header(working_dir)["current_stage"] == WorkflowStage.SCENE_BREAKDOWN
+
+
+
+@pytest.mark.unit
+class TestDeltaCheckpointing:
+    """Test save() -> delta log -> load() round trips"""
+    
+    def test_save_appends_only_changed_keys(self, tmp_path):
+        """Test a second save appends one delta with just the changed keys"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        assert read_deltas(working_dir) == []
+        
+        state.current_stage = WorkflowStage.IDEA_EXPANSION
+        state.revision_count = 1
+        state.save(working_dir)
+        state.save(working_dir)
+        
+        deltas = read_deltas(working_dir)
+        assert len(deltas) == 1
+        assert set(deltas[0]) == {"seq", "current_stage", "revision_count"}
+        
+        loaded = WorkflowState.load(working_dir)
+        assert loaded.current_stage == WorkflowStage.IDEA_EXPANSION
+        assert loaded.revision_count == 1
+        assert loaded.created_at == state.created_at
+    
+    def test_compaction_folds_deltas_into_snapshot(self, tmp_path):
+        """Test the log is truncated once DELTA_COMPACT_EVERY deltas are written"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        
+        for revision in range(1, DELTA_COMPACT_EVERY + 2):
+            state.revision_count = revision
+            state.save(working_dir)
+        
+        assert read_deltas(working_dir) == []
+        with open(os.path.join(working_dir, STATE_FILE_NAME), 'rb') as f:
+            snapshot = json.loads(f.read())
+        assert snapshot["revision_count"] == DELTA_COMPACT_EVERY + 1
+        assert snapshot["checkpoint_seq"] == DELTA_COMPACT_EVERY
+        assert WorkflowState.load(working_dir).revision_count == DELTA_COMPACT_EVERY + 1
+    
+    def test_interrupted_compaction_skips_folded_deltas(self, tmp_path):
+        """Test load() after a compaction whose log truncation never happened"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        for revision in (1, 2):
+            state.revision_count = revision
+            state.save(working_dir)
+        
+        state.revision_count = 3
+        apply_snapshot_only(state, working_dir)
+        state.revision_count = 4
+        state.save(working_dir)
+        
+        assert [delta["seq"] for delta in read_deltas(working_dir)] == [1, 2, 3]
+        assert WorkflowState.load(working_dir).revision_count == 4
+    
+    def test_failed_snapshot_keeps_previous_state(self, tmp_path, monkeypatch):
+        """Test a crash while writing a snapshot leaves the old files intact"""
+        working_dir = str(tmp_path)
+        state = make_state()
+        state.save(working_dir)
+        state.revision_count = 1
+        state.save(working_dir)
+        
+        def crash(fd):
+            raise OSError("disk full")
+        
+        monkeypatch.setattr(idea_guided_workflow.os, "fsync", crash)
+        state.revision_count = 2
+        with pytest.raises(OSError):
+            state.save(working_dir, pretty=True)
+        monkeypatch.undo()
+        
+        assert sorted(os.listdir(working_dir)) == sorted([STATE_FILE_NAME, DELTA_LOG_NAME])
+        assert WorkflowState.load(working_dir).revision_count == 1
+        
+        # The next save rewrites the full snapshot instead of a delta
+        state.save(working_dir)
+        assert read_deltas(working_dir) == []
+        assert WorkflowState.load(working_dir).revision_count == 2
@@ -12,7 +12,8 @@ import logging
 
 from utils.error_handling import (
     ViMaxError, ErrorCategory, ErrorSeverity,
-    APIError, TimeoutError, NetworkError, GenerationError
+    APIError, TimeoutError, NetworkError, GenerationError,
+    wrap_exception
 )
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,28 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open"  # 半开状态
 
 
+class CircuitBreakerOpenError(ViMaxError):
+    """熔断器打开错误 - 快速失败，不应重试"""
+    
+    def __init__(self, recovery_timeout: float, **kwargs):
+        details = kwargs.pop("details", {})
+        details["recovery_timeout"] = recovery_timeout
+        
+        super().__init__(
+            message=(
+                f"Circuit breaker is OPEN. "
+                f"Service unavailable. "
+                f"Will retry after {recovery_timeout}s"
+            ),
+            category=ErrorCategory.API,
+            severity=ErrorSeverity.HIGH,
+            details=details,
+            recoverable=False,
+            retry_suggested=False,
+            **kwargs
+        )
+
+
 class CircuitBreaker:
     """
     熔断器模式实现
@@ -58,7 +81,8 @@ class CircuitBreaker:
         self.expected_exception = expected_exception
         
         self.failure_count = 0
-        self.last_failure_time: Optional[float] = None
+        # 单调时钟纳秒数（time.monotonic_ns），不受系统时间调整影响
+        self.last_failure_time: Optional[int] = None
         self.state = CircuitState.CLOSED
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
@@ -74,18 +98,15 @@ class CircuitBreaker:
             函数返回值
         
         Raises:
-            Exception: 如果熔断器打开或函数调用失败
+            CircuitBreakerOpenError: 如果熔断器打开
+            Exception: 如果函数调用失败
         """
         if self.state == CircuitState.OPEN:
             if self._should_attempt_reset():
                 self.state = CircuitState.HALF_OPEN
                 logger.info(f"Circuit breaker entering HALF_OPEN state")
             else:
-                raise Exception(
-                    f"Circuit breaker is OPEN. "
-                    f"Service unavailable. "
-                    f"Will retry after {self.recovery_timeout}s"
-                )
+                raise CircuitBreakerOpenError(self.recovery_timeout)
         
         try:
             result = func(*args, **kwargs)
@@ -102,11 +123,7 @@ class CircuitBreaker:
                 self.state = CircuitState.HALF_OPEN
                 logger.info(f"Circuit breaker entering HALF_OPEN state")
             else:
-                raise Exception(
-                    f"Circuit breaker is OPEN. "
-                    f"Service unavailable. "
-                    f"Will retry after {self.recovery_timeout}s"
-                )
+                raise CircuitBreakerOpenError(self.recovery_timeout)
         
         try:
             result = await func(*args, **kwargs)
@@ -120,7 +137,7 @@ class CircuitBreaker:
         """是否应该尝试重置"""
         return (
             self.last_failure_time is not None and
-            time.time() - self.last_failure_time >= self.recovery_timeout
+            time.monotonic_ns() - self.last_failure_time >= self.recovery_timeout * 1e9
         )
     
     def _on_success(self):
@@ -132,7 +149,7 @@ class CircuitBreaker:
     def _on_failure(self):
         """失败时的处理"""
         self.failure_count += 1
-        self.last_failure_time = time.time()
+        self.last_failure_time = time.monotonic_ns()
         
         if self.failure_count >= self.failure_threshold:
             self.state = CircuitState.OPEN
@@ -182,6 +199,10 @@ class ErrorRecoveryManager:
         Returns:
             RecoveryStrategy
         """
+        # 熔断器已打开 - 快速失败，不重试
+        if isinstance(error, CircuitBreakerOpenError):
+            return RecoveryStrategy.ABORT
+        
         # 致命错误 - 中止
         if error.severity == ErrorSeverity.CRITICAL:
             return RecoveryStrategy.ABORT
@@ -418,13 +439,34 @@ def with_circuit_breaker(
             recovery_timeout
         )
         
+        expected_exception = breaker.expected_exception
+        
+        # CLOSED状态下直接调用函数（快速路径），其他状态才走完整的call逻辑
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            return await breaker.call_async(func, *args, **kwargs)
+            if breaker.state is not CircuitState.CLOSED:
+                return await breaker.call_async(func, *args, **kwargs)
+            try:
+                result = await func(*args, **kwargs)
+            except expected_exception:
+                breaker._on_failure()
+                raise
+            if breaker.failure_count:
+                breaker._on_success()
+            return result
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            return breaker.call(func, *args, **kwargs)
+            if breaker.state is not CircuitState.CLOSED:
+                return breaker.call(func, *args, **kwargs)
+            try:
+                result = func(*args, **kwargs)
+            except expected_exception:
+                breaker._on_failure()
+                raise
+            if breaker.failure_count:
+                breaker._on_success()
+            return result
         
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
@@ -457,20 +499,28 @@ async def safe_execute(
         (success, result) 元组
     """
     last_error = None
+    func_is_coro = asyncio.iscoroutinefunction(func)
     
     for attempt in range(max_retries):
         try:
-            if asyncio.iscoroutinefunction(func):
+            if func_is_coro:
                 result = await func(*args, **kwargs)
             else:
                 result = func(*args, **kwargs)
             return True, result
         except Exception as e:
+            # 熔断器已打开 - 直接跳过重试
+            if isinstance(e, CircuitBreakerOpenError):
+                last_error = e
+                if on_error:
+                    on_error(last_error)
+                logger.warning(f"Circuit breaker open, skipping retries: {e}")
+                break
+            
             # 包装为ViMaxError
             if isinstance(e, ViMaxError):
                 last_error = e
             else:
-                from utils.error_handling import wrap_exception
                 last_error = wrap_exception(e)
             
             # 调用错误回调
@@ -3,13 +3,21 @@ Comprehensive Error Reporting System
 Provides structured error tracking, logging, and user-friendly error messages
 """
 
+import sys
 import traceback
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Mapping, Sequence, Tuple
 from datetime import datetime
 from enum import Enum
+from types import MappingProxyType
 import json
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +30,14 @@ class ErrorSeverity(str, Enum):
     CRITICAL = "critical"
 
 
+# Logging level per severity (DEBUG and INFO both log at INFO)
+_SEVERITY_LOG_LEVEL: Mapping[ErrorSeverity, int] = MappingProxyType({
+    ErrorSeverity.CRITICAL: logging.CRITICAL,
+    ErrorSeverity.ERROR: logging.ERROR,
+    ErrorSeverity.WARNING: logging.WARNING,
+})
+
+
 class ErrorCategory(str, Enum):
     """Error categories for classification"""
     VALIDATION = "validation"
@@ -45,14 +61,15 @@ class ErrorContext:
         component: str,
         user_id: Optional[str] = None,
         episode_id: Optional[str] = None,
-        additional_data: Optional[Dict[str, Any]] = None
+        additional_data: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None
     ):
         self.operation = operation
         self.component = component
         self.user_id = user_id
         self.episode_id = episode_id
         self.additional_data = additional_data or {}
-        self.timestamp = datetime.utcnow().isoformat()
+        self.timestamp = timestamp or datetime.utcnow().isoformat()
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
@@ -67,34 +84,93 @@ class ErrorContext:
 
 
 class StructuredError:
-    """Structured error with full context"""
+    """
+    Structured error with full context
+
+    The context fields are stored directly on the error; ``context`` builds an
+    ErrorContext view on demand. Either pass an ErrorContext or the individual
+    context fields as keyword arguments.
+    """
+    __slots__ = (
+        "error", "severity", "category", "user_message", "recovery_suggestions",
+        "operation", "component", "user_id", "episode_id", "additional_data",
+        "timestamp", "error_id", "_exc_info", "_traceback"
+    )
+    
     def __init__(
         self,
         error: Exception,
-        context: ErrorContext,
+        context: Optional[ErrorContext] = None,
         severity: ErrorSeverity = ErrorSeverity.ERROR,
         category: ErrorCategory = ErrorCategory.UNKNOWN,
         user_message: Optional[str] = None,
-        recovery_suggestions: Optional[List[str]] = None
+        recovery_suggestions: Optional[Sequence[str]] = None,
+        *,
+        operation: str = "",
+        component: str = "",
+        user_id: Optional[str] = None,
+        episode_id: Optional[str] = None,
+        additional_data: Optional[Dict[str, Any]] = None,
+        _error_lower: Optional[str] = None
     ):
         self.error = error
-        self.context = context
+        if context is not None:
+            self.operation = context.operation
+            self.component = context.component
+            self.user_id = context.user_id
+            self.episode_id = context.episode_id
+            self.additional_data = context.additional_data
+            self.timestamp = context.timestamp
+        else:
+            self.operation = operation
+            self.component = component
+            self.user_id = user_id
+            self.episode_id = episode_id
+            self.additional_data = additional_data or {}
+            self.timestamp = datetime.utcnow().isoformat()
         self.severity = severity
         self.category = category
-        self.user_message = user_message or self._generate_user_message()
+        self.user_message = user_message or self._generate_user_message(_error_lower)
         self.recovery_suggestions = recovery_suggestions or []
-        self.traceback = traceback.format_exc()
+        # Keep exc_info references only; the traceback text is formatted on demand
+        self._exc_info = sys.exc_info()
+        self._traceback: Optional[str] = None
         self.error_id = self._generate_error_id()
     
+    @property
+    def context(self) -> ErrorContext:
+        """ErrorContext view of the context fields"""
+        return ErrorContext(
+            operation=self.operation,
+            component=self.component,
+            user_id=self.user_id,
+            episode_id=self.episode_id,
+            additional_data=self.additional_data,
+            timestamp=self.timestamp
+        )
+    
+    @property
+    def traceback(self) -> str:
+        """Formatted traceback (formatted lazily on first access)"""
+        if self._traceback is None:
+            exc_type, exc_value, exc_tb = self._exc_info
+            self._traceback = (
+                "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
+                if exc_type else ""
+            )
+            # Release frame references once the text is cached
+            self._exc_info = (None, None, None)
+        return self._traceback
+    
     def _generate_error_id(self) -> str:
         """Generate unique error ID"""
         import hashlib
-        content = f"{self.context.timestamp}{self.context.operation}{str(self.error)}"
+        content = f"{self.timestamp}{self.operation}{str(self.error)}"
         return hashlib.md5(content.encode()).hexdigest()[:12]
     
-    def _generate_user_message(self) -> str:
+    def _generate_user_message(self, error_lower: Optional[str] = None) -> str:
         """Generate user-friendly error message"""
-        error_str = str(self.error).lower()
+        error_str = error_lower if error_lower is not None else str(self.error).lower()
         
         # API-related errors
         if "rate limit" in error_str or "saturated" in error_str:
@@ -129,8 +205,15 @@ class StructuredError:
             "message": self.user_message,
             "technical_details": str(self.error),
             "recovery_suggestions": self.recovery_suggestions,
-            "context": self.context.to_dict(),
-            "timestamp": self.context.timestamp
+            "context": {
+                "operation": self.operation,
+                "component": self.component,
+                "user_id": self.user_id,
+                "episode_id": self.episode_id,
+                "additional_data": self.additional_data,
+                "timestamp": self.timestamp
+            },
+            "timestamp": self.timestamp
         }
     
     def to_log_dict(self) -> Dict[str, Any]:
@@ -140,22 +223,31 @@ class StructuredError:
             "traceback": self.traceback
         }
     
+    def to_json(self) -> bytes:
+        """Serialize to_dict() as JSON bytes (orjson when available)"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(self.to_dict(), default=str)
+        return json.dumps(self.to_dict(), default=str).encode()
+    
     def log(self):
         """Log the error with appropriate level"""
-        log_data = self.to_log_dict()
+        level = _SEVERITY_LOG_LEVEL.get(self.severity, logging.INFO)
+        # Skip encoding the payload when the record would be dropped anyway
+        if not logger.isEnabledFor(level):
+            return
+        
+        # The traceback is left to the logging handlers via exc_info, so it is
+        # only formatted when a record is actually emitted; WARNING/INFO
+        # records carry none, as before. The payload is passed pre-encoded so
+        # handlers can ship it without re-serializing.
+        log_data = {"payload_bytes": self.to_json()}
+        exc_info = self._exc_info if level >= logging.ERROR and self._exc_info[0] else None
         log_message = (
-            f"[{self.error_id}] {self.category.upper()} in {self.context.component}.{self.context.operation}: "
+            f"[{self.error_id}] {self.category.upper()} in {self.component}.{self.operation}: "
             f"{str(self.error)}"
         )
         
-        if self.severity == ErrorSeverity.CRITICAL:
-            logger.critical(log_message, extra=log_data)
-        elif self.severity == ErrorSeverity.ERROR:
-            logger.error(log_message, extra=log_data)
-        elif self.severity == ErrorSeverity.WARNING:
-            logger.warning(log_message, extra=log_data)
-        else:
-            logger.info(log_message, extra=log_data)
+        logger.log(level, log_message, exc_info=exc_info, extra=log_data)
 
 
 class ErrorReporter:
@@ -171,7 +263,7 @@ class ErrorReporter:
         severity: ErrorSeverity = ErrorSeverity.ERROR,
         category: ErrorCategory = ErrorCategory.UNKNOWN,
         user_message: Optional[str] = None,
-        recovery_suggestions: Optional[List[str]] = None
+        recovery_suggestions: Optional[Sequence[str]] = None
     ) -> StructuredError:
         """Report an error with full context"""
         structured_error = StructuredError(
@@ -182,7 +274,10 @@ class ErrorReporter:
             user_message=user_message,
             recovery_suggestions=recovery_suggestions
         )
-        
+        return self.record(structured_error)
+    
+    def record(self, structured_error: StructuredError) -> StructuredError:
+        """Log and store an already-built StructuredError"""
         # Log the error
         structured_error.log()
         
@@ -208,7 +303,7 @@ class ErrorReporter:
         if category:
             filtered = [e for e in filtered if e.category == category]
         if episode_id:
-            filtered = [e for e in filtered if e.context.episode_id == episode_id]
+            filtered = [e for e in filtered if e.episode_id == episode_id]
         
         return filtered[-limit:]
     
@@ -222,7 +317,7 @@ class ErrorReporter:
     def clear_errors(self, episode_id: Optional[str] = None):
         """Clear errors, optionally filtered by episode"""
         if episode_id:
-            self.errors = [e for e in self.errors if e.context.episode_id != episode_id]
+            self.errors = [e for e in self.errors if e.episode_id != episode_id]
         else:
             self.errors.clear()
 
@@ -231,9 +326,9 @@ class ErrorReporter:
 error_reporter = ErrorReporter()
 
 
-def categorize_error(error: Exception) -> ErrorCategory:
+def categorize_error(error: Exception, _lower: Optional[str] = None) -> ErrorCategory:
     """Automatically categorize an error"""
-    error_str = str(error).lower()
+    error_str = _lower if _lower is not None else str(error).lower()
     error_type = type(error).__name__.lower()
     
     if "validation" in error_str or "pydantic" in error_type:
@@ -260,52 +355,59 @@ def categorize_error(error: Exception) -> ErrorCategory:
         return ErrorCategory.UNKNOWN
 
 
-def get_recovery_suggestions(category: ErrorCategory) -> List[str]:
+# Recovery suggestions per category (immutable, shared across reports)
+_RECOVERY_SUGGESTIONS: Mapping[ErrorCategory, Tuple[str, ...]] = MappingProxyType({
+    ErrorCategory.RATE_LIMIT: (
+        "Wait a few moments before retrying",
+        "Reduce the frequency of requests",
+        "Consider upgrading your API plan"
+    ),
+    ErrorCategory.TIMEOUT: (
+        "Try again with a simpler request",
+        "Check your internet connection",
+        "The service may be experiencing high load"
+    ),
+    ErrorCategory.NETWORK: (
+        "Check your internet connection",
+        "Verify the service is accessible",
+        "Try again in a few moments"
+    ),
+    ErrorCategory.AUTHENTICATION: (
+        "Verify your API credentials",
+        "Check if your API key is still valid",
+        "Ensure you have the necessary permissions"
+    ),
+    ErrorCategory.VALIDATION: (
+        "Check your input data format",
+        "Ensure all required fields are provided",
+        "Verify data types match requirements"
+    ),
+    ErrorCategory.DATABASE: (
+        "Check database connection",
+        "Verify database credentials",
+        "Ensure database is running"
+    ),
+    ErrorCategory.FILE_IO: (
+        "Check file permissions",
+        "Verify file path exists",
+        "Ensure sufficient disk space"
+    ),
+    ErrorCategory.RESOURCE: (
+        "Free up system resources",
+        "Reduce concurrent operations",
+        "Consider upgrading system resources"
+    )
+})
+
+_DEFAULT_RECOVERY_SUGGESTIONS: Tuple[str, ...] = (
+    "Try again later",
+    "Contact support if the issue persists"
+)
+
+
+def get_recovery_suggestions(category: ErrorCategory) -> Tuple[str, ...]:
     """Get recovery suggestions based on error category"""
-    suggestions = {
-        ErrorCategory.RATE_LIMIT: [
-            "Wait a few moments before retrying",
-            "Reduce the frequency of requests",
-            "Consider upgrading your API plan"
-        ],
-        ErrorCategory.TIMEOUT: [
-            "Try again with a simpler request",
-            "Check your internet connection",
-            "The service may be experiencing high load"
-        ],
-        ErrorCategory.NETWORK: [
-            "Check your internet connection",
-            "Verify the service is accessible",
-            "Try again in a few moments"
-        ],
-        ErrorCategory.AUTHENTICATION: [
-            "Verify your API credentials",
-            "Check if your API key is still valid",
-            "Ensure you have the necessary permissions"
-        ],
-        ErrorCategory.VALIDATION: [
-            "Check your input data format",
-            "Ensure all required fields are provided",
-            "Verify data types match requirements"
-        ],
-        ErrorCategory.DATABASE: [
-            "Check database connection",
-            "Verify database credentials",
-            "Ensure database is running"
-        ],
-        ErrorCategory.FILE_IO: [
-            "Check file permissions",
-            "Verify file path exists",
-            "Ensure sufficient disk space"
-        ],
-        ErrorCategory.RESOURCE: [
-            "Free up system resources",
-            "Reduce concurrent operations",
-            "Consider upgrading system resources"
-        ]
-    }
-    
-    return suggestions.get(category, ["Try again later", "Contact support if the issue persists"])
+    return _RECOVERY_SUGGESTIONS.get(category, _DEFAULT_RECOVERY_SUGGESTIONS)
 
 
 # Convenience function for quick error reporting
@@ -318,23 +420,22 @@ def report_error(
     additional_data: Optional[Dict[str, Any]] = None
 ) -> StructuredError:
     """Quick error reporting with automatic categorization"""
-    category = categorize_error(error)
+    # Materialize and lowercase the message once for categorization and user message
+    error_lower = str(error).lower()
+    category = categorize_error(error, _lower=error_lower)
     suggestions = get_recovery_suggestions(category)
     
-    context = ErrorContext(
-        operation=operation,
-        component=component,
-        episode_id=episode_id,
-        additional_data=additional_data
-    )
-    
-    return error_reporter.report(
+    return error_reporter.record(StructuredError(
         error=error,
-        context=context,
         category=category,
         user_message=user_message,
-        recovery_suggestions=suggestions
-    )
+        recovery_suggestions=suggestions,
+        operation=operation,
+        component=component,
+        episode_id=episode_id,
+        additional_data=additional_data,
+        _error_lower=error_lower
+    ))
 
 
 # Example usage:
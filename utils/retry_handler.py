@@ -13,14 +13,16 @@ This module provides a comprehensive retry handler with:
 import time
 import asyncio
 import logging
+import itertools
+import os
 import random
-import uuid
-from typing import Callable, Any, Optional, Dict, Type, Union, List
-from functools import wraps
+import re
+from contextvars import ContextVar
+from typing import Callable, Any, Optional, Dict, Type, Union, List, Literal
+from functools import wraps, lru_cache
 from enum import Enum
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from collections import defaultdict
+from dataclasses import dataclass, field, fields, replace
+from collections import Counter
 import threading
 
 
@@ -45,22 +47,35 @@ class ErrorClassifier:
     # Error patterns for classification
     RETRIABLE_PATTERNS = [
         "timeout", "connection", "network", "temporary",
-        "unavailable", "503", "502", "504", "429"
+        "unavailable"
     ]
     
     NON_RETRIABLE_PATTERNS = [
-        "invalid", "not found", "404", "400", "unauthorized",
-        "forbidden", "403", "401", "bad request"
+        "invalid", "not found", "unauthorized",
+        "forbidden", "bad request"
     ]
     
     RATE_LIMIT_PATTERNS = [
-        "rate limit", "too many requests", "429", "quota exceeded"
+        "rate limit", "too many requests", "quota exceeded"
     ]
     
+    # HTTP status codes, matched as whole 3-digit tokens (so "1429ms" is not a 429)
+    RETRIABLE_CODES = frozenset({"502", "503", "504"})
+    NON_RETRIABLE_CODES = frozenset({"400", "401", "403", "404"})
+    RATE_LIMIT_CODES = frozenset({"429"})
+    _CODE_RE = re.compile(r"\b\d{3}\b")
+    
     BALANCE_PATTERNS = [
         "insufficient", "balance", "quota", "credit", "limit exceeded"
     ]
     
+    # Precompiled alternations (one C-level scan per category instead of a
+    # Python-level substring loop). Kept separate so category priority in
+    # classify() is independent of where a pattern occurs in the message.
+    _BALANCE_RE = re.compile("|".join(map(re.escape, BALANCE_PATTERNS)))
+    _RATE_LIMIT_RE = re.compile("|".join(map(re.escape, RATE_LIMIT_PATTERNS)))
+    _NON_RETRIABLE_RE = re.compile("|".join(map(re.escape, NON_RETRIABLE_PATTERNS)))
+    
     @classmethod
     def classify(cls, error: Exception) -> ErrorType:
         """
@@ -72,40 +87,67 @@ class ErrorClassifier:
         Returns:
             ErrorType: The classified error type
         """
-        error_msg = str(error).lower()
-        error_type_name = type(error).__name__.lower()
+        # Fast-fail rejection by our own breaker, not a service failure
+        if isinstance(error, CircuitOpenError):
+            return ErrorType.NON_RETRIABLE
+        return cls._classify_message(type(error).__name__.lower(), str(error).lower())
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _classify_message(error_type_name: str, error_msg: str) -> ErrorType:
+        """
+        Classify a lowercased exception type name and message.
+        
+        Memoized because production failures tend to repeat the exact same
+        message (e.g. the same 429 body), so storms hit the cache.
+        """
+        cls = ErrorClassifier
         
         # Check for specific exception types first
         if "timeout" in error_type_name:
             return ErrorType.TIMEOUT
         
         # Check balance/quota issues
-        if any(pattern in error_msg for pattern in cls.BALANCE_PATTERNS):
+        if cls._BALANCE_RE.search(error_msg):
             return ErrorType.INSUFFICIENT_BALANCE
         
+        codes = frozenset(cls._CODE_RE.findall(error_msg))
+        
         # Check rate limiting
-        if any(pattern in error_msg for pattern in cls.RATE_LIMIT_PATTERNS):
+        if codes & cls.RATE_LIMIT_CODES or cls._RATE_LIMIT_RE.search(error_msg):
             return ErrorType.RATE_LIMIT
         
         # Check non-retriable errors
-        if any(pattern in error_msg for pattern in cls.NON_RETRIABLE_PATTERNS):
+        if codes & cls.NON_RETRIABLE_CODES or cls._NON_RETRIABLE_RE.search(error_msg):
             return ErrorType.NON_RETRIABLE
         
-        # Check retriable errors
-        if any(pattern in error_msg for pattern in cls.RETRIABLE_PATTERNS):
-            return ErrorType.RETRIABLE
-        
-        # Default to retriable for unknown errors
+        # Retriable patterns/codes and unknown errors all classify as
+        # retriable, so no scan of RETRIABLE_PATTERNS/RETRIABLE_CODES is needed
         return ErrorType.RETRIABLE
 
 
+# Error types that indicate the service itself is failing and should count
+# toward opening the circuit breaker (client errors such as 4xx do not)
+_BREAKER_TRIPPING_ERRORS = frozenset({
+    ErrorType.RETRIABLE,
+    ErrorType.TIMEOUT,
+    ErrorType.RATE_LIMIT,
+    ErrorType.SERVICE_UNAVAILABLE,
+})
+
+
 # ============================================================================
 # Retry Configuration
 # ============================================================================
 
-@dataclass
+@dataclass(frozen=True)
 class RetryConfig:
-    """Configuration for retry behavior."""
+    """
+    Configuration for retry behavior.
+    
+    Frozen so shared instances (e.g. PROVIDER_CONFIGS) cannot be mutated;
+    derive variants with dataclasses.replace().
+    """
     
     # Basic retry settings
     max_retries: int = 5
@@ -113,6 +155,10 @@ class RetryConfig:
     max_delay: float = 60.0
     exponential_base: float = 2.0
     jitter: bool = True
+    # "full": uniform(0, delay) (AWS Full Jitter), "equal": delay/2 + uniform(0, delay/2),
+    # "decorrelated": min(max_delay, uniform(base_delay, previous_sleep * 3)),
+    # "legacy": delay * uniform(*jitter_range)
+    jitter_strategy: Literal["full", "equal", "decorrelated", "legacy"] = "full"
     jitter_range: tuple[float, float] = (0.5, 1.5)
     
     # Timeout settings
@@ -123,6 +169,16 @@ class RetryConfig:
     retry_on_rate_limit: bool = True
     retry_on_service_unavailable: bool = True
     
+    # Retry budget (token bucket): every retry spends one token and every
+    # success refunds retry_budget_ratio tokens, capping retry traffic at
+    # roughly that fraction of successful traffic once the bucket drains.
+    # The bucket also refills at retry_budget_min_rps tokens per second, so
+    # a drained budget recovers during an outage when there are no successes
+    retry_budget_enabled: bool = True
+    retry_budget_max_tokens: float = 10.0
+    retry_budget_ratio: float = 0.1
+    retry_budget_min_rps: float = 1.0
+    
     # Circuit breaker settings
     circuit_breaker_enabled: bool = True
     circuit_breaker_threshold: int = 5
@@ -162,21 +218,24 @@ PROVIDER_CONFIGS: Dict[str, RetryConfig] = {
         base_delay=5.0,
         max_delay=300.0,
         exponential_base=2.0,
-        circuit_breaker_threshold=5
+        circuit_breaker_threshold=5,
+        jitter_strategy="decorrelated"
     ),
     "luma": RetryConfig(
         max_retries=3,
         base_delay=5.0,
         max_delay=300.0,
         exponential_base=2.0,
-        circuit_breaker_threshold=5
+        circuit_breaker_threshold=5,
+        jitter_strategy="decorrelated"
     ),
     "kling": RetryConfig(
         max_retries=3,
         base_delay=5.0,
         max_delay=300.0,
         exponential_base=2.0,
-        circuit_breaker_threshold=5
+        circuit_breaker_threshold=5,
+        jitter_strategy="decorrelated"
     ),
     "default": RetryConfig()
 }
@@ -186,6 +245,15 @@ PROVIDER_CONFIGS: Dict[str, RetryConfig] = {
 # Circuit Breaker
 # ============================================================================
 
+class CircuitOpenError(RuntimeError):
+    """
+    Raised when the circuit breaker rejects an attempt.
+    
+    Classified as NON_RETRIABLE and never counted as a breaker failure, so
+    rejected calls cannot keep pushing back the OPEN -> HALF_OPEN transition.
+    """
+
+
 class CircuitState(Enum):
     """Circuit breaker states."""
     CLOSED = "closed"      # Normal operation
@@ -207,12 +275,15 @@ class CircuitBreaker:
     
     # Internal state
     failure_count: int = field(default=0, init=False)
-    last_failure_time: Optional[datetime] = field(default=None, init=False)
+    last_failure_time: float = field(default=0.0, init=False)  # time.monotonic()
     state: CircuitState = field(default=CircuitState.CLOSED, init=False)
     _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
     
     def record_success(self):
         """Record a successful call."""
+        # Lock-free fast path: nothing to reset in the steady CLOSED state
+        if self.failure_count == 0 and self.state is CircuitState.CLOSED:
+            return
         with self._lock:
             self.failure_count = 0
             self.state = CircuitState.CLOSED
@@ -221,24 +292,24 @@ class CircuitBreaker:
         """Record a failed call."""
         with self._lock:
             self.failure_count += 1
-            self.last_failure_time = datetime.now()
+            self.last_failure_time = time.monotonic()
             
             if self.failure_count >= self.threshold:
                 self.state = CircuitState.OPEN
     
     def can_attempt(self) -> bool:
         """Check if a call attempt is allowed."""
+        # Lock-free fast path: a single attribute read is atomic under the GIL,
+        # and CLOSED needs no read-modify-write
+        if self.state is CircuitState.CLOSED:
+            return True
+        
         with self._lock:
-            if self.state == CircuitState.CLOSED:
-                return True
-            
-            if self.state == CircuitState.OPEN:
+            if self.state is CircuitState.OPEN:
                 # Check if timeout has passed
-                if self.last_failure_time:
-                    elapsed = (datetime.now() - self.last_failure_time).total_seconds()
-                    if elapsed >= self.timeout:
-                        self.state = CircuitState.HALF_OPEN
-                        return True
+                if time.monotonic() - self.last_failure_time >= self.timeout:
+                    self.state = CircuitState.HALF_OPEN
+                    return True
                 return False
             
             # HALF_OPEN state - allow one attempt
@@ -248,7 +319,7 @@ class CircuitBreaker:
         """Reset the circuit breaker."""
         with self._lock:
             self.failure_count = 0
-            self.last_failure_time = None
+            self.last_failure_time = 0.0
             self.state = CircuitState.CLOSED
 
 
@@ -256,47 +327,116 @@ class CircuitBreaker:
 # Metrics Collection
 # ============================================================================
 
-@dataclass
+class _MetricsShard:
+    """Per-thread metrics counters (only written by their owning thread)."""
+    
+    __slots__ = (
+        "total_attempts", "successful_attempts", "failed_attempts",
+        "retry_counts", "error_types", "total_latency"
+    )
+    
+    def __init__(self):
+        self.total_attempts = 0
+        self.successful_attempts = 0
+        self.failed_attempts = 0
+        self.retry_counts: Counter = Counter()
+        self.error_types: Counter = Counter()
+        self.total_latency = 0.0
+
+
 class RetryMetrics:
-    """Metrics for monitoring retry behavior."""
-    
-    total_attempts: int = 0
-    successful_attempts: int = 0
-    failed_attempts: int = 0
-    retry_counts: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
-    error_types: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
-    total_latency: float = 0.0
-    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    """
+    Metrics for monitoring retry behavior.
+    
+    Recording is lock-free: each thread writes to its own shard, and the
+    shards are merged when metrics are read. The lock is only taken the
+    first time a thread records (to register its shard).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[_MetricsShard] = []
+    
+    def _shard(self) -> _MetricsShard:
+        """Return the calling thread's shard, registering it on first use."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _MetricsShard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
     
     def record_attempt(self, success: bool, retries: int, latency: float, error_type: Optional[str] = None):
         """Record a retry attempt."""
-        with self._lock:
-            self.total_attempts += 1
-            if success:
-                self.successful_attempts += 1
-            else:
-                self.failed_attempts += 1
-            
-            self.retry_counts[retries] += 1
-            self.total_latency += latency
-            
-            if error_type:
-                self.error_types[error_type] += 1
+        shard = self._shard()
+        shard.total_attempts += 1
+        if success:
+            shard.successful_attempts += 1
+        else:
+            shard.failed_attempts += 1
+        
+        shard.retry_counts[retries] += 1
+        shard.total_latency += latency
+        
+        if error_type:
+            shard.error_types[error_type] += 1
+    
+    @property
+    def total_attempts(self) -> int:
+        return sum(shard.total_attempts for shard in tuple(self._shards))
+    
+    @property
+    def successful_attempts(self) -> int:
+        return sum(shard.successful_attempts for shard in tuple(self._shards))
+    
+    @property
+    def failed_attempts(self) -> int:
+        return sum(shard.failed_attempts for shard in tuple(self._shards))
+    
+    @property
+    def total_latency(self) -> float:
+        return sum(shard.total_latency for shard in tuple(self._shards))
+    
+    @property
+    def retry_counts(self) -> Counter:
+        merged: Counter = Counter()
+        for shard in tuple(self._shards):
+            # dict() copy is a single C-level operation, safe against
+            # concurrent writes by the owning thread
+            merged.update(dict(shard.retry_counts))
+        return merged
+    
+    @property
+    def error_types(self) -> Counter:
+        merged: Counter = Counter()
+        for shard in tuple(self._shards):
+            merged.update(dict(shard.error_types))
+        return merged
     
     def get_success_rate(self) -> float:
         """Calculate success rate."""
-        if self.total_attempts == 0:
+        total_attempts = self.total_attempts
+        if total_attempts == 0:
             return 0.0
-        return self.successful_attempts / self.total_attempts
+        return self.successful_attempts / total_attempts
     
     def get_average_latency(self) -> float:
         """Calculate average latency."""
-        if self.total_attempts == 0:
+        total_attempts = self.total_attempts
+        if total_attempts == 0:
             return 0.0
-        return self.total_latency / self.total_attempts
+        return self.total_latency / total_attempts
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get comprehensive statistics."""
+        """
+        Get comprehensive statistics.
+        
+        Merges the per-thread shards without blocking recorders; values
+        recorded concurrently may be missing from the snapshot.
+        """
         return {
             "total_attempts": self.total_attempts,
             "successful_attempts": self.successful_attempts,
@@ -312,6 +452,48 @@ class RetryMetrics:
 # Retry Handler
 # ============================================================================
 
+# Process-unique correlation IDs: "<pid>-<counter>" in hex
+_correlation_counter = itertools.count()
+
+
+def _next_correlation_id() -> str:
+    """Generate a cheap process-unique correlation ID."""
+    return f"{os.getpid():x}-{next(_correlation_counter):x}"
+
+
+# Correlation ID of the retry-wrapped call currently executing; propagates
+# across await boundaries
+_correlation_id_var: ContextVar[str] = ContextVar("retry_correlation_id", default="-")
+
+
+class _CorrelationIdFilter(logging.Filter):
+    """Inject the current correlation ID into log records."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id_var.get()
+        return True
+
+
+def _setup_module_logger() -> logging.Logger:
+    """Setup the shared structured logger for all retry handlers."""
+    logger = logging.getLogger("retry_handler")
+    
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.addFilter(_CorrelationIdFilter())
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - '
+            '[%(correlation_id)s] - %(message)s'
+        )
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    
+    return logger
+
+
+_setup_module_logger()
+
+
 class RetryHandler:
     """
     Production-ready retry handler with comprehensive features.
@@ -349,7 +531,7 @@ class RetryHandler:
         """
         self.config = config or PROVIDER_CONFIGS.get(provider, PROVIDER_CONFIGS["default"])
         self.provider = provider
-        self.correlation_id = correlation_id or str(uuid.uuid4())
+        self._correlation_id = correlation_id
         
         # Initialize components
         self.circuit_breaker = CircuitBreaker(
@@ -358,23 +540,34 @@ class RetryHandler:
         ) if self.config.circuit_breaker_enabled else None
         
         self.metrics = RetryMetrics()
-        self.logger = self._setup_logger()
-    
-    def _setup_logger(self) -> logging.Logger:
-        """Setup structured logger."""
-        logger = logging.getLogger(f"retry_handler.{self.provider}")
-        logger.setLevel(self.config.log_level)
-        
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - '
-                f'[{self.correlation_id}] - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
+        # Per-provider child of the shared "retry_handler" logger
+        self.logger = logging.getLogger(f"retry_handler.{self.provider}")
+        self.logger.setLevel(self.config.log_level)
         
-        return logger
+        # Capped exponential backoff per attempt, precomputed since the config
+        # is fixed for the lifetime of the handler
+        cfg = self.config
+        self._base_delays = tuple(
+            min(cfg.base_delay * (cfg.exponential_base ** i), cfg.max_delay)
+            for i in range(cfg.max_retries + 1)
+        )
+        self._jitter_lo, self._jitter_hi = cfg.jitter_range
+        # Per-handler RNG so concurrent handlers don't contend on the global one
+        self._rng = random.Random()
+        # Previous sleep for decorrelated jitter
+        self._prev_sleep = cfg.base_delay
+        
+        # Retry budget tokens (updated without a lock; small races under
+        # concurrency only make the budget approximate)
+        self._retry_tokens = cfg.retry_budget_max_tokens
+        self._retry_tokens_refilled_at = time.monotonic()
+    
+    @property
+    def correlation_id(self) -> str:
+        """Correlation ID for request tracking (generated on first use)."""
+        if self._correlation_id is None:
+            self._correlation_id = _next_correlation_id()
+        return self._correlation_id
     
     def _calculate_delay(self, attempt: int) -> float:
         """
@@ -386,18 +579,29 @@ class RetryHandler:
         Returns:
             float: Delay in seconds
         """
-        # Exponential backoff
-        delay = min(
-            self.config.base_delay * (self.config.exponential_base ** attempt),
-            self.config.max_delay
-        )
+        # Exponential backoff (table lookup; attempts never exceed max_retries,
+        # out-of-range indices are clamped defensively)
+        base_delays = self._base_delays
+        delay = base_delays[attempt] if attempt < len(base_delays) else base_delays[-1]
         
         # Add jitter to prevent thundering herd
-        if self.config.jitter:
-            jitter_min, jitter_max = self.config.jitter_range
-            delay = delay * random.uniform(jitter_min, jitter_max)
+        if not self.config.jitter:
+            return delay
         
-        return delay
+        strategy = self.config.jitter_strategy
+        if strategy == "full":
+            return self._rng.random() * delay
+        if strategy == "equal":
+            half = delay * 0.5
+            return half + self._rng.random() * half
+        if strategy == "decorrelated":
+            # Each retry sequence starts over from base_delay
+            base_delay = self.config.base_delay
+            prev_sleep = base_delay if attempt == 0 else self._prev_sleep
+            delay = min(self.config.max_delay, self._rng.uniform(base_delay, prev_sleep * 3.0))
+            self._prev_sleep = delay
+            return delay
+        return delay * self._rng.uniform(self._jitter_lo, self._jitter_hi)
     
     def _should_retry(self, error: Exception, attempt: int) -> tuple[bool, ErrorType]:
         """
@@ -442,162 +646,194 @@ class RetryHandler:
         
         return True, error_type
     
+    def _check_circuit_breaker(self):
+        """Raise if the circuit breaker rejects the next attempt."""
+        if self.circuit_breaker and not self.circuit_breaker.can_attempt():
+            raise CircuitOpenError(
+                f"Circuit breaker OPEN for provider {self.provider}"
+            )
+    
+    def _acquire_retry_token(self) -> bool:
+        """Spend one retry budget token; False if the budget is exhausted."""
+        cfg = self.config
+        if not cfg.retry_budget_enabled:
+            return True
+        
+        # Time-based refill (the retry_budget_min_rps floor)
+        now = time.monotonic()
+        tokens = min(
+            cfg.retry_budget_max_tokens,
+            self._retry_tokens + (now - self._retry_tokens_refilled_at) * cfg.retry_budget_min_rps
+        )
+        self._retry_tokens_refilled_at = now
+        
+        if tokens < 1.0:
+            self._retry_tokens = tokens
+            return False
+        self._retry_tokens = tokens - 1.0
+        return True
+    
+    def _record_success(self, attempt: int, start_time: float):
+        """Record metrics and circuit breaker state for a successful call."""
+        if self.config.retry_budget_enabled:
+            self._retry_tokens = min(
+                self.config.retry_budget_max_tokens,
+                self._retry_tokens + self.config.retry_budget_ratio
+            )
+        
+        latency = time.monotonic() - start_time
+        self.metrics.record_attempt(True, attempt, latency)
+        
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success()
+        
+        if self.config.log_success:
+            self.logger.info(
+                f"Success after {attempt} retries, latency: {latency:.2f}s"
+            )
+    
+    def _handle_exception(
+        self,
+        error: Exception,
+        attempt: int,
+        start_time: float
+    ) -> Optional[float]:
+        """
+        Shared failure handling for one failed attempt.
+        
+        Classifies the error, updates the circuit breaker, logs and records
+        metrics when giving up.
+        
+        Args:
+            error: The exception raised by the attempt
+            attempt: Current attempt number (0-indexed)
+            start_time: time.monotonic() at the first attempt
+            
+        Returns:
+            Optional[float]: Delay before the next attempt, or None if the
+            error should be re-raised
+        """
+        should_retry, error_type = self._should_retry(error, attempt)
+        
+        # Record circuit breaker failure (service-side failures only)
+        if self.circuit_breaker and error_type in _BREAKER_TRIPPING_ERRORS:
+            self.circuit_breaker.record_failure()
+        
+        # Log the error
+        if self.config.log_retries:
+            self.logger.warning(
+                f"Attempt {attempt + 1}/{self.config.max_retries} failed: "
+                f"{type(error).__name__}: {str(error)}\n"
+                f"Error type: {error_type.value}\n"
+                f"Will retry: {should_retry}"
+            )
+        
+        # Don't retry if not appropriate
+        if not should_retry:
+            latency = time.monotonic() - start_time
+            self.metrics.record_attempt(False, attempt, latency, error_type.value)
+            return None
+        
+        # All retries exhausted
+        if attempt >= self.config.max_retries - 1:
+            latency = time.monotonic() - start_time
+            self.metrics.record_attempt(False, attempt + 1, latency, error_type.value)
+            
+            self.logger.error(
+                f"All {self.config.max_retries} retry attempts exhausted. "
+                f"Last error: {type(error).__name__}: {str(error)}"
+            )
+            return None
+        
+        # Retry budget exhausted - the retries themselves would become the load
+        if not self._acquire_retry_token():
+            latency = time.monotonic() - start_time
+            self.metrics.record_attempt(False, attempt + 1, latency, error_type.value)
+            
+            self.logger.warning(
+                f"Retry budget exhausted for provider {self.provider}, not retrying. "
+                f"Last error: {type(error).__name__}: {str(error)}"
+            )
+            return None
+        
+        delay = self._calculate_delay(attempt)
+        self.logger.info(f"Waiting {delay:.2f}s before retry...")
+        return delay
+    
     def __call__(self, func: Callable) -> Callable:
         """
         Decorator to add retry logic to a function.
         
+        The retry count and timeout are read from the config when the function
+        is decorated.
+        
         Args:
             func: Function to wrap with retry logic
             
         Returns:
             Wrapped function with retry capability
         """
+        # Bind config values and bound methods to locals once per decoration
+        # so the per-call path uses fast local loads instead of attribute chains
+        max_retries = self.config.max_retries
+        timeout = self.config.timeout
+        check_circuit_breaker = self._check_circuit_breaker
+        handle_exception = self._handle_exception
+        record_success = self._record_success
+        set_correlation_id = _correlation_id_var.set
+        reset_correlation_id = _correlation_id_var.reset
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs) -> Any:
             """Async wrapper with retry logic."""
-            start_time = time.time()
-            last_exception = None
-            attempt = 0
-            
-            while attempt < self.config.max_retries:
-                try:
-                    # Check circuit breaker
-                    if self.circuit_breaker and not self.circuit_breaker.can_attempt():
-                        raise RuntimeError(
-                            f"Circuit breaker OPEN for provider {self.provider}"
-                        )
-                    
-                    # Apply timeout if configured
-                    if self.config.timeout:
-                        result = await asyncio.wait_for(
-                            func(*args, **kwargs),
-                            timeout=self.config.timeout
-                        )
-                    else:
-                        result = await func(*args, **kwargs)
-                    
-                    # Success - record metrics and return
-                    latency = time.time() - start_time
-                    self.metrics.record_attempt(True, attempt, latency)
-                    
-                    if self.circuit_breaker:
-                        self.circuit_breaker.record_success()
-                    
-                    if self.config.log_success:
-                        self.logger.info(
-                            f"Success after {attempt} retries, latency: {latency:.2f}s"
-                        )
-                    
-                    return result
+            token = set_correlation_id(self.correlation_id)
+            try:
+                start_time = time.monotonic()
                 
-                except Exception as e:
-                    last_exception = e
-                    should_retry, error_type = self._should_retry(e, attempt)
-                    
-                    # Record circuit breaker failure
-                    if self.circuit_breaker:
-                        self.circuit_breaker.record_failure()
-                    
-                    # Log the error
-                    if self.config.log_retries:
-                        self.logger.warning(
-                            f"Attempt {attempt + 1}/{self.config.max_retries} failed: "
-                            f"{type(e).__name__}: {str(e)}\n"
-                            f"Error type: {error_type.value}\n"
-                            f"Will retry: {should_retry}"
-                        )
-                    
-                    # Don't retry if not appropriate
-                    if not should_retry:
-                        latency = time.time() - start_time
-                        self.metrics.record_attempt(False, attempt, latency, error_type.value)
-                        raise
-                    
-                    # Calculate and apply delay
-                    if attempt < self.config.max_retries - 1:
-                        delay = self._calculate_delay(attempt)
-                        self.logger.info(f"Waiting {delay:.2f}s before retry...")
+                for attempt in range(max_retries):
+                    try:
+                        check_circuit_breaker()
+                        
+                        # Apply timeout if configured
+                        if timeout:
+                            result = await asyncio.wait_for(
+                                func(*args, **kwargs),
+                                timeout=timeout
+                            )
+                        else:
+                            result = await func(*args, **kwargs)
+                    except Exception as e:
+                        delay = handle_exception(e, attempt, start_time)
+                        if delay is None:
+                            raise
                         await asyncio.sleep(delay)
-                    
-                    attempt += 1
-            
-            # All retries exhausted
-            latency = time.time() - start_time
-            self.metrics.record_attempt(False, attempt, latency, error_type.value)
-            
-            self.logger.error(
-                f"All {self.config.max_retries} retry attempts exhausted. "
-                f"Last error: {type(last_exception).__name__}: {str(last_exception)}"
-            )
-            raise last_exception
+                    else:
+                        record_success(attempt, start_time)
+                        return result
+            finally:
+                reset_correlation_id(token)
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs) -> Any:
             """Sync wrapper with retry logic."""
-            start_time = time.time()
-            last_exception = None
-            attempt = 0
-            
-            while attempt < self.config.max_retries:
-                try:
-                    # Check circuit breaker
-                    if self.circuit_breaker and not self.circuit_breaker.can_attempt():
-                        raise RuntimeError(
-                            f"Circuit breaker OPEN for provider {self.provider}"
-                        )
-                    
-                    result = func(*args, **kwargs)
-                    
-                    # Success
-                    latency = time.time() - start_time
-                    self.metrics.record_attempt(True, attempt, latency)
-                    
-                    if self.circuit_breaker:
-                        self.circuit_breaker.record_success()
-                    
-                    if self.config.log_success:
-                        self.logger.info(
-                            f"Success after {attempt} retries, latency: {latency:.2f}s"
-                        )
-                    
-                    return result
+            token = set_correlation_id(self.correlation_id)
+            try:
+                start_time = time.monotonic()
                 
-                except Exception as e:
-                    last_exception = e
-                    should_retry, error_type = self._should_retry(e, attempt)
-                    
-                    if self.circuit_breaker:
-                        self.circuit_breaker.record_failure()
-                    
-                    if self.config.log_retries:
-                        self.logger.warning(
-                            f"Attempt {attempt + 1}/{self.config.max_retries} failed: "
-                            f"{type(e).__name__}: {str(e)}\n"
-                            f"Error type: {error_type.value}\n"
-                            f"Will retry: {should_retry}"
-                        )
-                    
-                    if not should_retry:
-                        latency = time.time() - start_time
-                        self.metrics.record_attempt(False, attempt, latency, error_type.value)
-                        raise
-                    
-                    if attempt < self.config.max_retries - 1:
-                        delay = self._calculate_delay(attempt)
-                        self.logger.info(f"Waiting {delay:.2f}s before retry...")
+                for attempt in range(max_retries):
+                    try:
+                        check_circuit_breaker()
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        delay = handle_exception(e, attempt, start_time)
+                        if delay is None:
+                            raise
                         time.sleep(delay)
-                    
-                    attempt += 1
-            
-            # All retries exhausted
-            latency = time.time() - start_time
-            self.metrics.record_attempt(False, attempt, latency, error_type.value)
-            
-            self.logger.error(
-                f"All {self.config.max_retries} retry attempts exhausted. "
-                f"Last error: {type(last_exception).__name__}: {str(last_exception)}"
-            )
-            raise last_exception
+                    else:
+                        record_success(attempt, start_time)
+                        return result
+            finally:
+                reset_correlation_id(token)
         
         # Return appropriate wrapper based on function type
         if asyncio.iscoroutinefunction(func):
@@ -684,12 +920,12 @@ def create_retry_handler(
     Returns:
         RetryHandler: Configured retry handler
     """
-    config = PROVIDER_CONFIGS.get(provider, PROVIDER_CONFIGS["default"])
-    config.max_retries = max_retries
+    base = PROVIDER_CONFIGS.get(provider, PROVIDER_CONFIGS["default"])
     
-    for key, value in kwargs.items():
-        if hasattr(config, key):
-            setattr(config, key, value)
+    # Derive a copy; never mutate the shared provider config
+    valid_keys = {f.name for f in fields(RetryConfig)}
+    overrides = {key: value for key, value in kwargs.items() if key in valid_keys}
+    config = replace(base, max_retries=max_retries, **overrides)
     
     return RetryHandler(config=config, provider=provider)
 
@@ -703,6 +939,10 @@ def retry_with_backoff(
     """
     Simple decorator for retry with exponential backoff.
     
+    Each decorated function gets its own RetryHandler (circuit breaker,
+    metrics, retry budget). To share that state across functions, create
+    one handler with create_retry_handler() and use it as the decorator.
+    
     Args:
         max_retries: Maximum number of retry attempts
         base_delay: Base delay in seconds
@@ -722,7 +962,11 @@ def retry_with_backoff(
         base_delay=base_delay,
         max_delay=max_delay
     )
-    return RetryHandler(config=config, provider=provider)
+    
+    def decorator(func: Callable) -> Callable:
+        return RetryHandler(config=config, provider=provider)(func)
+    
+    return decorator
 
 
 # ============================================================================
@@ -736,6 +980,7 @@ __all__ = [
     "ErrorType",
     "ErrorClassifier",
     "CircuitBreaker",
+    "CircuitOpenError",
     "CircuitState",
     "RetryMetrics",
     "PROVIDER_CONFIGS",
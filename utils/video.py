@@ -1,22 +1,42 @@
+import asyncio
+import json
 import logging
+import os
+import aiofiles
+import aiohttp
 import requests
+import shutil
 import subprocess
 from pathlib import Path
-from typing import List
-from tenacity import retry
+from typing import Iterable, List, Optional, Tuple
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter
+from utils.retry import after_func
 
 
-@retry
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DOWNLOAD_MAX_CONNECTIONS = 16
+
+# 异步下载共享的会话（按事件循环缓存），复用TCP/TLS连接
+_download_session: Optional[Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = None
+
+
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=1, max=60),
+    after=after_func,
+    reraise=True,
+)
 def download_video(url, save_path):
     try:
         logging.info(f"Downloading video from {url} to {save_path}")
 
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # 检查请求是否成功
-    
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()  # 检查请求是否成功
+
+            # 解码gzip等传输编码后由copyfileobj在C层循环写入
+            response.raw.decode_content = True
+            with open(save_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
 
         logging.info(f"Video downloaded successfully to {save_path}")
     
@@ -25,6 +45,163 @@ def download_video(url, save_path):
         raise e
 
 
+async def _get_download_session() -> aiohttp.ClientSession:
+    """Return the shared download session for the running event loop."""
+    global _download_session
+    loop = asyncio.get_running_loop()
+    current = _download_session
+    if current is not None and current[0] is loop and not current[1].closed:
+        return current[1]
+
+    # 先替换再关闭旧会话, 关闭期间并发的调用直接拿到新会话
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=DOWNLOAD_MAX_CONNECTIONS),
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+    )
+    _download_session = (loop, session)
+    if current is not None:
+        await _close_session(*current)
+    return session
+
+
+async def _close_session(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+    """Close a download session created on the given event loop."""
+    if session.closed:
+        return
+    if loop is asyncio.get_running_loop() or loop.is_closed():
+        # 旧事件循环已关闭时其连接随之失效, close()只做标记, 可在当前循环上完成
+        await session.close()
+    else:
+        # 会话属于另一个线程中的事件循环, 交给它关闭
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+
+async def close_download_session() -> None:
+    """Close the shared download session (call on application shutdown)."""
+    global _download_session
+    current, _download_session = _download_session, None
+    if current is not None:
+        await _close_session(*current)
+
+
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=1, max=60),
+    after=after_func,
+    reraise=True,
+)
+async def download_video_async(url, save_path):
+    """Async version of download_video, reusing pooled connections."""
+    try:
+        logging.info(f"Downloading video from {url} to {save_path}")
+
+        session = await _get_download_session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+
+            async with aiofiles.open(save_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+
+        logging.info(f"Video downloaded successfully to {save_path}")
+
+    except Exception as e:
+        logging.error(f"Error downloading video: {e}")
+        raise e
+
+
+async def download_videos_batch(pairs: Iterable[Tuple[str, str]]) -> None:
+    """
+    Download several videos concurrently over the shared connection pool.
+
+    Args:
+        pairs: (url, save_path) tuples
+    """
+    await asyncio.gather(*(download_video_async(url, path) for url, path in pairs))
+
+
+def _probe_video_stream(video_path: str) -> Tuple[str, ...]:
+    """Return (codec_name, width, height, pix_fmt, r_frame_rate) of the first video stream."""
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=codec_name,width,height,pix_fmt,r_frame_rate',
+            '-of', 'csv=p=0',
+            video_path
+        ],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return tuple(result.stdout.strip().split(','))
+
+
+def _probe_audio(video_path: str) -> Tuple[bool, float]:
+    """Return (has_audio, container duration in seconds) of a video file."""
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a',
+            '-show_entries', 'stream=index:format=duration',
+            '-of', 'json',
+            video_path
+        ],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    info = json.loads(result.stdout)
+    return bool(info.get("streams")), float(info.get("format", {}).get("duration") or 0)
+
+
+def _reencode_concat_cmd(
+    video_paths: List[str],
+    video_params: Tuple[str, ...],
+    audio_params: List[Tuple[bool, float]],
+    output_path: str
+) -> List[str]:
+    """
+    Build an ffmpeg command that concatenates inputs with different streams.
+    
+    Every input is scaled/padded to the size and frame rate of the first
+    one and re-encoded to H.264/yuv420p (AAC audio). Inputs without audio
+    get a silent track of their own duration so the segments stay aligned.
+    """
+    _, width, height, _, fps = video_params
+    # yuv420p needs even dimensions
+    width, height = int(width) // 2 * 2, int(height) // 2 * 2
+    with_audio = any(has_audio for has_audio, _ in audio_params)
+    
+    cmd = ['ffmpeg', '-nostdin']
+    for video_path in video_paths:
+        cmd += ['-i', video_path]
+    
+    filters = []
+    segments = ""
+    for i, (has_audio, duration) in enumerate(audio_params):
+        filters.append(
+            f"[{i}:v:0]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[v{i}]"
+        )
+        segments += f"[v{i}]"
+        if with_audio:
+            if has_audio:
+                filters.append(f"[{i}:a:0]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a{i}]")
+            else:
+                filters.append(f"anullsrc=r=48000:cl=stereo,atrim=duration={duration}[a{i}]")
+            segments += f"[a{i}]"
+    filters.append(
+        f"{segments}concat=n={len(video_paths)}:v=1:a={int(with_audio)}[v]" + ("[a]" if with_audio else "")
+    )
+    
+    cmd += ['-filter_complex', ';'.join(filters), '-map', '[v]']
+    if with_audio:
+        cmd += ['-map', '[a]', '-c:a', 'aac']
+    cmd += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-y', output_path]
+    return cmd
+
+
 def concatenate_videos(video_paths: List[str], output_path: str) -> str:
     """
     Concatenate multiple video files into a single video using ffmpeg.
@@ -49,41 +226,62 @@ def concatenate_videos(video_paths: List[str], output_path: str) -> str:
             raise ValueError("No valid video paths provided for concatenation")
         
         if len(valid_paths) == 1:
-            # If only one video, just copy it
-            import shutil
-            shutil.copy(valid_paths[0], output_path)
-            logging.info(f"Single video copied to {output_path}")
+            # If only one video, hard-link it (metadata only); fall back to a
+            # byte copy across devices or when the output already exists
+            try:
+                os.link(valid_paths[0], output_path)
+                logging.info(f"Single video linked to {output_path}")
+            except OSError:
+                shutil.copy(valid_paths[0], output_path)
+                logging.info(f"Single video copied to {output_path}")
             return output_path
         
-        # Create a temporary file list for ffmpeg
-        list_file = Path(output_path).parent / "concat_list.txt"
-        with open(list_file, 'w') as f:
-            for video_path in valid_paths:
-                # Use absolute paths and escape special characters
-                abs_path = Path(video_path).absolute()
-                f.write(f"file '{abs_path}'\n")
+        # Stream copy (-c copy) requires identical codec parameters and the
+        # same audio layout; shots from different providers are re-encoded
+        video_params = [_probe_video_stream(p) for p in valid_paths]
+        audio_params = [_probe_audio(p) for p in valid_paths]
+        stream_copy = (
+            len(set(video_params)) == 1
+            and len({has_audio for has_audio, _ in audio_params}) == 1
+        )
         
-        # Use ffmpeg to concatenate videos
-        cmd = [
-            'ffmpeg',
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', str(list_file),
-            '-c', 'copy',
-            '-y',  # Overwrite output file if it exists
-            output_path
-        ]
+        if stream_copy:
+            # Build the concat list in memory and feed it through stdin, so no
+            # temp file can collide between parallel jobs or leak on a crash.
+            # Entries need the explicit file: protocol, otherwise ffmpeg resolves
+            # them relative to the list's own URL ("pipe:/abs/path")
+            concat_list = "".join(
+                "file 'file:{}'\n".format(str(Path(video_path).absolute()).replace("'", "'\\''"))
+                for video_path in valid_paths
+            )
+            
+            # Use ffmpeg to concatenate videos
+            cmd = [
+                'ffmpeg',
+                '-f', 'concat',
+                '-safe', '0',
+                '-protocol_whitelist', 'pipe,file',
+                '-i', 'pipe:0',
+                '-c', 'copy',
+                '-y',  # Overwrite output file if it exists
+                output_path
+            ]
+        else:
+            details = "; ".join(
+                f"{Path(p).name}: {','.join(v)}" for p, v in zip(valid_paths, video_params)
+            )
+            logging.info(f"Stream parameters differ, re-encoding (codec,width,height,pix_fmt,fps): {details}")
+            concat_list = None
+            cmd = _reencode_concat_cmd(valid_paths, video_params[0], audio_params, output_path)
         
         result = subprocess.run(
             cmd,
+            input=concat_list,
             capture_output=True,
             text=True,
             check=True
         )
         
-        # Clean up temporary file
-        list_file.unlink(missing_ok=True)
-        
         logging.info(f"Videos concatenated successfully to {output_path}")
         return output_path
         
@@ -1,18 +1,44 @@
 """
 WebSocket Manager
 WebSocket连接管理和实时进度推送
+
+所有发送路径都在事件循环上执行, 生产环境建议安装uvloop (>=0.19, 非Windows),
+uvicorn的默认loop="auto"会自动使用它
 """
 
-from typing import Dict, Set, Optional, Any, Callable
+from typing import Dict, Set, Optional, Any, Callable, Deque, Tuple, List
 from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.websockets import WebSocketState
+from collections import OrderedDict, deque
+from itertools import islice
 import asyncio
 import json
 import logging
-from datetime import datetime
+import sys
+import time
+from datetime import datetime, timezone
 from enum import Enum
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# 扇出循环中按身份比较连接状态, 省去 .name 属性链和字符串比较
+_CONNECTED = WebSocketState.CONNECTED
+
+# 跨进程广播的Redis频道: ws:topic:{topic} / ws:room:{room} / ws:all
+_REDIS_CHANNEL_PREFIX = "ws:"
+
 
 class MessageType(Enum):
     """消息类型"""
@@ -25,6 +51,132 @@ class MessageType(Enum):
     HEARTBEAT = "heartbeat"
 
 
+def _now_iso() -> str:
+    """
+    当前UTC时间的ISO字符串 (带时区, 替代已弃用的utcnow)
+    
+    精确到毫秒: 更短的帧, 也足够前端排序和显示
+    """
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _json_default(obj: Any) -> Any:
+    """orjson/json无法直接序列化的对象: Enum取值, 日期转ISO字符串, 其余转str"""
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    """
+    序列化消息为紧凑JSON文本帧
+    
+    广播时每条消息只序列化一次, 再把同一个字符串发给所有客户端。
+    两种后端都接受Enum/datetime字段, 输出一致
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            message, default=_json_default, option=orjson.OPT_NON_STR_KEYS
+        ).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+def _text_frame(text: str) -> Dict[str, str]:
+    """
+    把已序列化的文本包装成ASGI websocket.send事件
+    
+    同一条消息的所有接收方共用这一个事件对象, 写协程直接交给websocket.send,
+    省去send_text为每个客户端重新构造事件字典
+    """
+    return {"type": "websocket.send", "text": text}
+
+
+def _frame(message: Dict[str, Any]) -> Dict[str, str]:
+    """序列化消息并包装成发送事件"""
+    return _text_frame(_encode(message))
+
+
+# 消息类型的字符串值在导入时取出并驻留, 热路径上不再经过Enum属性查找
+_MT_PROGRESS = sys.intern(MessageType.PROGRESS.value)
+_MT_STATUS = sys.intern(MessageType.STATUS.value)
+_MT_ERROR = sys.intern(MessageType.ERROR.value)
+_MT_WARNING = sys.intern(MessageType.WARNING.value)
+_MT_INFO = sys.intern(MessageType.INFO.value)
+_MT_COMPLETE = sys.intern(MessageType.COMPLETE.value)
+_MT_HEARTBEAT = sys.intern(MessageType.HEARTBEAT.value)
+
+
+def _type_prefix(message_type: str) -> str:
+    """预先序列化 '{"type":"<type>",' 前缀"""
+    return '{"type":' + _encode(message_type) + ","
+
+
+# 每种消息类型的前缀字符串, 直接作为 _typed_frame 的参数传入,
+# 省去以Enum成员为键查表 (Enum.__hash__ 是Python层函数)
+_PROGRESS_PREFIX = _type_prefix(_MT_PROGRESS)
+_STATUS_PREFIX = _type_prefix(_MT_STATUS)
+_ERROR_PREFIX = _type_prefix(_MT_ERROR)
+_WARNING_PREFIX = _type_prefix(_MT_WARNING)
+_INFO_PREFIX = _type_prefix(_MT_INFO)
+_COMPLETE_PREFIX = _type_prefix(_MT_COMPLETE)
+_HEARTBEAT_PREFIX = _type_prefix(_MT_HEARTBEAT)
+
+
+def _typed_frame(prefix: str, fields: Dict[str, Any]) -> Dict[str, str]:
+    """
+    按消息类型模板构造发送事件
+    
+    type字段直接拼接预先序列化的前缀 (_XXX_PREFIX), 只编码其余字段 (fields不能为空)
+    """
+    return _text_frame(prefix + _encode(fields)[1:])
+
+
+# ping的回复内容固定, 导入时构造一次, 所有客户端共用
+_PONG_FRAME = _typed_frame(_INFO_PREFIX, {"message": "pong"})
+
+
+class _ClientConnection:
+    """
+    单个客户端的发送状态
+    
+    socket、发送队列和写协程放在同一个对象里, 扇出时每个客户端只需一次字典查找
+    """
+    
+    __slots__ = ("client_id", "websocket", "queue", "writer", "on_overflow")
+    
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        max_queue_size: int,
+        on_overflow: Optional[Callable[["_ClientConnection"], None]] = None
+    ):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.on_overflow = on_overflow
+    
+    def send(self, frame: Dict[str, str]):
+        """
+        把预先构造好的发送事件放入队列 (不阻塞调用方)
+        
+        队列满时丢弃最旧的一条, 慢客户端只会丢消息而不会拖住发布方或占用无限内存;
+        随后通知on_overflow (由管理器决定是否断开该客户端)
+        """
+        queue = self.queue
+        try:
+            queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait(frame)
+            logger.debug(f"Send queue full for {self.client_id}, dropped oldest message")
+            if self.on_overflow is not None:
+                self.on_overflow(self)
+
+
 class WebSocketManager:
     """
     Enhanced WebSocket Manager with Room Support
@@ -34,6 +186,7 @@ class WebSocketManager:
     - Connection pooling
     - Heartbeat monitoring
     - Message history
+    - Per-client bounded send queues
     - Automatic cleanup
     """
     
@@ -50,15 +203,56 @@ class WebSocketManager:
         # 订阅关系: {topic: Set[client_id]} (legacy support)
         self.subscriptions: Dict[str, Set[str]] = {}
         
-        # 心跳任务
-        self.heartbeat_tasks: Dict[str, asyncio.Task] = {}
+        # Client topics: {client_id: Set[topic]}
+        self.client_topics: Dict[str, Set[str]] = {}
+        
+        # 统计计数器, 在订阅/房间变更时增量维护, get_stats无需遍历
+        self._total_subscriptions = 0
+        self._room_sizes: Dict[str, int] = {}
+        self._topic_sizes: Dict[str, int] = {}
+        
+        # 全局心跳任务 (所有连接共用一个, 首次连接时启动)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.heartbeat_interval = 30
         
-        # 消息历史: {topic: List[message]}
-        self.message_history: Dict[str, list] = {}
+        # 发送状态: {client_id: _ClientConnection}, 队列由每个客户端的写协程消费
+        self._clients: Dict[str, _ClientConnection] = {}
+        self.max_queue_size = 256
+        # 队列溢出时的策略: False只丢最旧的消息; True直接断开跟不上的客户端 (关闭码1013)
+        self.close_slow_clients = False
+        
+        # 消息历史: {topic: Deque[frame]}, 存已序列化的发送事件, 回放时无需重新编码;
+        # 每个主题最多max_history_size条, 所有主题合计不超过max_history_bytes,
+        # 超出时从最久未写入的主题开始淘汰
+        self.message_history: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
         self.max_history_size = 100
+        self.max_history_bytes = 32 * 1024 * 1024
+        self._history_bytes = 0
+        
+        # 进度合并: {topic: (last_percentage, last_sent_at)}, 以及被合并待发送的最新进度
+        # (只保存字段, 到真正发送时才序列化, 被覆盖的进度不产生编码开销)
+        self._progress_state: Dict[str, Tuple[float, float]] = {}
+        self._pending_progress: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._progress_flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self.progress_min_interval = 0.1
+        self.progress_min_delta = 0.005
+        # 状态条目数达到该值时清理过期条目, 之后阈值按剩余条目数翻倍 (均摊O(1))
+        self._progress_prune_at = 256
+        
+        # 主题批量窗口: 窗口内发往同一主题的消息合并成一帧 (换行分隔的JSON) 发给每个订阅者;
+        # 0表示关闭, 客户端需要按换行拆分帧
+        self.topic_batch_window = 0.0
+        self.topic_batch_max_bytes = 32 * 1024
+        self._topic_batches: Dict[str, List[str]] = {}
+        self._topic_batch_bytes: Dict[str, int] = {}
+        self._topic_batch_handles: Dict[str, asyncio.TimerHandle] = {}
         
         # Connection metadata
         self.connection_metadata: Dict[str, Dict[str, Any]] = {}
+        
+        # 可选的Redis pub/sub后端 (多worker部署时跨进程扇出)
+        self._redis = None
+        self._pubsub_task: Optional[asyncio.Task] = None
     
     async def connect(
         self,
@@ -78,10 +272,19 @@ class WebSocketManager:
         """
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        connected_at = _now_iso()
+        
+        # 启动写协程 (同一client_id重连时替换旧的)
+        previous = self._clients.get(client_id)
+        if previous is not None:
+            previous.writer.cancel()
+        conn = _ClientConnection(client_id, websocket, self.max_queue_size, self._on_client_overflow)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        self._clients[client_id] = conn
         
         # Store metadata
         self.connection_metadata[client_id] = metadata or {}
-        self.connection_metadata[client_id]["connected_at"] = datetime.utcnow().isoformat()
+        self.connection_metadata[client_id]["connected_at"] = connected_at
         
         # Initialize client rooms
         self.client_rooms[client_id] = set()
@@ -91,23 +294,18 @@ class WebSocketManager:
             self.join_room(client_id, room)
         
         # 启动心跳
-        self.heartbeat_tasks[client_id] = asyncio.create_task(
-            self._heartbeat(client_id)
-        )
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
         
         logger.info(f"Client {client_id} connected. Total connections: {len(self.active_connections)}")
         
         # 发送欢迎消息
-        await self.send_personal_message(
-            client_id,
-            {
-                "type": MessageType.INFO.value,
-                "message": "Connected to ViMax WebSocket server",
-                "timestamp": datetime.utcnow().isoformat(),
-                "client_id": client_id,
-                "room": room
-            }
-        )
+        conn.send(_typed_frame(_INFO_PREFIX, {
+            "message": "Connected to ViMax WebSocket server",
+            "timestamp": connected_at,
+            "client_id": client_id,
+            "room": room
+        }))
     
     def disconnect(self, client_id: str):
         """
@@ -116,27 +314,31 @@ class WebSocketManager:
         Args:
             client_id: Client ID
         """
-        # 取消心跳任务
-        if client_id in self.heartbeat_tasks:
-            self.heartbeat_tasks[client_id].cancel()
-            del self.heartbeat_tasks[client_id]
+        # 停止写协程, 丢弃未发送的消息
+        conn = self._clients.pop(client_id, None)
+        if conn is not None:
+            conn.writer.cancel()
         
         # 移除连接
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         
-        # Remove from all rooms
-        if client_id in self.client_rooms:
-            for room in list(self.client_rooms[client_id]):
-                self.leave_room(client_id, room)
-            del self.client_rooms[client_id]
-        
-        # 取消所有订阅 (legacy)
-        for topic in list(self.subscriptions.keys()):
-            if client_id in self.subscriptions[topic]:
-                self.subscriptions[topic].remove(client_id)
-                if not self.subscriptions[topic]:
+        # Remove from all rooms (先取出客户端的房间集合, 遍历时无需拷贝)
+        for room in self.client_rooms.pop(client_id, ()):
+            self.leave_room(client_id, room)
+        
+        # 取消所有订阅 (legacy), 只遍历该客户端自己的主题
+        for topic in self.client_topics.pop(client_id, ()):
+            subscribers = self.subscriptions.get(topic)
+            if subscribers is not None and client_id in subscribers:
+                subscribers.remove(client_id)
+                self._total_subscriptions -= 1
+                if subscribers:
+                    self._topic_sizes[topic] = len(subscribers)
+                else:
                     del self.subscriptions[topic]
+                    del self._topic_sizes[topic]
+                    self._drop_progress_state(topic)
         
         # Remove metadata
         if client_id in self.connection_metadata:
@@ -152,12 +354,86 @@ class WebSocketManager:
             client_id: 客户端ID
             message: 消息内容
         """
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending message to {client_id}: {e}")
-                self.disconnect(client_id)
+        self._enqueue(client_id, _frame(message))
+    
+    async def send_pong(self, client_id: str):
+        """
+        回复客户端的ping (预先构造的固定帧, 不再逐次序列化)
+        
+        Args:
+            client_id: 客户端ID
+        """
+        self._enqueue(client_id, _PONG_FRAME)
+    
+    def _enqueue(self, client_id: str, frame: Dict[str, str]) -> bool:
+        """
+        把发送事件放入客户端发送队列
+        
+        Returns:
+            客户端是否存在
+        """
+        conn = self._clients.get(client_id)
+        if conn is None:
+            return False
+        conn.send(frame)
+        return True
+    
+    async def _writer(self, conn: _ClientConnection):
+        """
+        写协程: 按顺序把队列中的消息写入WebSocket
+        
+        队列中已是完整的ASGI事件, 直接交给底层ASGI send,
+        跳过Starlette WebSocket.send每条消息的状态与事件类型检查;
+        连接是否仍然可用由扇出前的client_state检查和下面的异常处理负责
+        
+        Args:
+            conn: 客户端发送状态
+        """
+        client_id = conn.client_id
+        websocket = conn.websocket
+        send = getattr(websocket, "_send", websocket.send)
+        queue = conn.queue
+        try:
+            while True:
+                await send(await queue.get())
+        except asyncio.CancelledError:
+            return
+        except (OSError, WebSocketDisconnect, RuntimeError) as e:
+            # 对端已关闭: 绕过Starlette后表现为ClientDisconnected(OSError),
+            # 服务器拒绝在关闭后发送时为RuntimeError; 按异常类型判断, 不再匹配消息文本
+            logger.debug(f"WebSocket for {client_id} closed while sending: {e!r}")
+        except Exception as e:
+            logger.error(f"Error sending message to {client_id}: {e}")
+        
+        # 只清理自己这条连接, 避免误删同一client_id的新连接
+        if self._clients.get(client_id) is conn:
+            self.disconnect(client_id)
+    
+    def _on_client_overflow(self, conn: _ClientConnection):
+        """
+        发送队列溢出回调
+        
+        可能在扇出循环中被调用, 断开操作推迟到本轮循环结束后执行, 避免遍历时修改订阅集合
+        """
+        if self.close_slow_clients:
+            asyncio.get_running_loop().call_soon(self._close_slow_client, conn)
+    
+    def _close_slow_client(self, conn: _ClientConnection):
+        """断开发送队列持续溢出的客户端并关闭其socket"""
+        client_id = conn.client_id
+        if self._clients.get(client_id) is not conn:
+            return
+        
+        logger.warning(f"Client {client_id} cannot keep up with its send queue, closing connection")
+        self.disconnect(client_id)
+        asyncio.get_running_loop().create_task(self._close_websocket(conn.websocket))
+    
+    async def _close_websocket(self, websocket: WebSocket):
+        """关闭socket (1013: try again later), 已关闭时忽略"""
+        try:
+            await websocket.close(code=1013)
+        except Exception as e:
+            logger.debug(f"Error closing slow WebSocket: {e!r}")
     
     async def broadcast(self, message: Dict[str, Any]):
         """
@@ -166,16 +442,23 @@ class WebSocketManager:
         Args:
             message: 消息内容
         """
+        frame = _frame(message)
+        
+        if self._redis is not None:
+            await self._redis_publish("all", frame)
+        else:
+            self._broadcast_local(frame)
+    
+    def _broadcast_local(self, frame: Dict[str, str]):
+        """把发送事件放入本进程所有连接的发送队列, 与房间/主题扇出一样跳过并清理已断开的连接"""
         disconnected_clients = []
         
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to {client_id}: {e}")
+        for client_id, conn in self._clients.items():
+            if conn.websocket.client_state is _CONNECTED:
+                conn.send(frame)
+            else:
                 disconnected_clients.append(client_id)
         
-        # 清理断开的连接
         for client_id in disconnected_clients:
             self.disconnect(client_id)
     
@@ -190,14 +473,17 @@ class WebSocketManager:
         if topic not in self.subscriptions:
             self.subscriptions[topic] = set()
         
-        self.subscriptions[topic].add(client_id)
+        subscribers = self.subscriptions[topic]
+        if client_id not in subscribers:
+            subscribers.add(client_id)
+            self._total_subscriptions += 1
+            self._topic_sizes[topic] = len(subscribers)
+        self.client_topics.setdefault(client_id, set()).add(topic)
         logger.info(f"Client {client_id} subscribed to topic: {topic}")
         
-        # 发送历史消息
+        # 发送历史消息 (直接放入发送队列, 无需单独的任务)
         if topic in self.message_history:
-            asyncio.create_task(
-                self._send_history(client_id, topic)
-            )
+            self._send_history(client_id, topic)
     
     def unsubscribe(self, client_id: str, topic: str):
         """
@@ -207,11 +493,23 @@ class WebSocketManager:
             client_id: 客户端ID
             topic: 主题名称
         """
-        if topic in self.subscriptions and client_id in self.subscriptions[topic]:
-            self.subscriptions[topic].remove(client_id)
+        topics = self.client_topics.get(client_id)
+        if topics is not None:
+            topics.discard(topic)
+            if not topics:
+                del self.client_topics[client_id]
+        
+        subscribers = self.subscriptions.get(topic)
+        if subscribers is not None and client_id in subscribers:
+            subscribers.remove(client_id)
+            self._total_subscriptions -= 1
             
-            if not self.subscriptions[topic]:
+            if subscribers:
+                self._topic_sizes[topic] = len(subscribers)
+            else:
                 del self.subscriptions[topic]
+                del self._topic_sizes[topic]
+                self._drop_progress_state(topic)
             
             logger.info(f"Client {client_id} unsubscribed from topic: {topic}")
     
@@ -227,6 +525,7 @@ class WebSocketManager:
             self.rooms[room] = set()
         
         self.rooms[room].add(client_id)
+        self._room_sizes[room] = len(self.rooms[room])
         
         if client_id not in self.client_rooms:
             self.client_rooms[client_id] = set()
@@ -246,8 +545,11 @@ class WebSocketManager:
         if room in self.rooms and client_id in self.rooms[room]:
             self.rooms[room].remove(client_id)
             
-            if not self.rooms[room]:
+            if self.rooms[room]:
+                self._room_sizes[room] = len(self.rooms[room])
+            else:
                 del self.rooms[room]
+                del self._room_sizes[room]
         
         if client_id in self.client_rooms and room in self.client_rooms[client_id]:
             self.client_rooms[client_id].remove(room)
@@ -266,6 +568,18 @@ class WebSocketManager:
         """
         return self.rooms.get(room, set()).copy()
     
+    def get_room_size(self, room: str) -> int:
+        """
+        Get number of clients in a room (from the maintained counter, no copy)
+        
+        Args:
+            room: Room name
+        
+        Returns:
+            Number of client IDs in the room
+        """
+        return self._room_sizes.get(room, 0)
+    
     async def broadcast_to_room(self, room: str, message: Dict[str, Any]):
         """
         Broadcast message to all clients in a room
@@ -275,25 +589,33 @@ class WebSocketManager:
             message: Message content
         """
         if "timestamp" not in message:
-            message["timestamp"] = datetime.utcnow().isoformat()
+            message["timestamp"] = _now_iso()
+        
+        frame = _frame(message)
         
+        if self._redis is not None:
+            await self._redis_publish(f"room:{room}", frame)
+        else:
+            self._broadcast_to_room_local(room, frame)
+    
+    def _broadcast_to_room_local(self, room: str, frame: Dict[str, str]):
+        """把发送事件放入本进程房间成员的发送队列"""
         if room not in self.rooms:
             logger.debug(f"No clients in room: {room}")
             return
         
         disconnected_clients = []
         
-        for client_id in list(self.rooms[room]):
-            if client_id in self.active_connections:
-                try:
-                    websocket = self.active_connections[client_id]
-                    if websocket.client_state.name == "CONNECTED":
-                        await websocket.send_json(message)
-                    else:
-                        disconnected_clients.append(client_id)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to {client_id} in room {room}: {e}")
-                    disconnected_clients.append(client_id)
+        # 直接遍历集合不做拷贝: 循环体只入队, 不会修改房间成员, 断开的连接在循环后统一清理
+        clients = self._clients
+        for client_id in self.rooms[room]:
+            conn = clients.get(client_id)
+            if conn is None:
+                continue
+            if conn.websocket.client_state is _CONNECTED:
+                conn.send(frame)
+            else:
+                disconnected_clients.append(client_id)
         
         # Cleanup disconnected clients
         for client_id in disconnected_clients:
@@ -309,42 +631,90 @@ class WebSocketManager:
         """
         # 添加时间戳
         if "timestamp" not in message:
-            message["timestamp"] = datetime.utcnow().isoformat()
+            message["timestamp"] = _now_iso()
+        
+        await self._publish_frame(topic, _frame(message))
+    
+    async def _publish_frame(self, topic: str, frame: Dict[str, str]):
+        """发布已序列化的消息到主题"""
+        # 先发出被合并的进度, 保证它不会晚于状态/完成消息到达
+        pending = self._take_pending_progress(topic)
+        if pending is not None:
+            await self._dispatch(topic, pending)
         
+        await self._dispatch(topic, frame)
+    
+    async def _dispatch(self, topic: str, frame: Dict[str, str]):
+        """启用Redis时经由Redis扇出到所有worker, 否则直接发给本地订阅者"""
+        if self._redis is not None:
+            await self._redis_publish(f"topic:{topic}", frame)
+        else:
+            self._publish_local(topic, frame)
+    
+    def _publish_local(self, topic: str, frame: Dict[str, str]):
+        """
+        写入历史并把消息放入本地订阅者的发送队列
+        
+        Args:
+            topic: 主题名称
+            frame: 发送事件
+        """
         # 保存到历史
-        if topic not in self.message_history:
-            self.message_history[topic] = []
+        self._append_history(topic, frame)
         
-        self.message_history[topic].append(message)
+        if self.topic_batch_window > 0 and self.subscriptions.get(topic):
+            self._add_to_topic_batch(topic, frame["text"])
+        else:
+            self._fan_out_topic(topic, frame)
+    
+    def _add_to_topic_batch(self, topic: str, text: str):
+        """加入主题的批量窗口, 窗口到期或累计超过topic_batch_max_bytes时发出"""
+        batch = self._topic_batches.get(topic)
+        if batch is None:
+            batch = self._topic_batches[topic] = []
+            self._topic_batch_bytes[topic] = 0
+            self._topic_batch_handles[topic] = asyncio.get_running_loop().call_later(
+                self.topic_batch_window, self._flush_topic_batch, topic
+            )
         
-        # 限制历史大小
-        if len(self.message_history[topic]) > self.max_history_size:
-            self.message_history[topic] = self.message_history[topic][-self.max_history_size:]
+        batch.append(text)
+        self._topic_batch_bytes[topic] += len(text)
+        if self._topic_batch_bytes[topic] >= self.topic_batch_max_bytes:
+            self._flush_topic_batch(topic)
+    
+    def _flush_topic_batch(self, topic: str):
+        """把主题批量窗口内的消息合并成一帧发给订阅者"""
+        handle = self._topic_batch_handles.pop(topic, None)
+        if handle is not None:
+            handle.cancel()
+        self._topic_batch_bytes.pop(topic, None)
+        batch = self._topic_batches.pop(topic, None)
+        if batch:
+            self._fan_out_topic(topic, _text_frame("\n".join(batch)))
+    
+    def _fan_out_topic(self, topic: str, frame: Dict[str, str]):
+        """
+        把发送事件放入主题所有本地订阅者的发送队列
         
-        # 发送给订阅者（如果有的话）
+        Args:
+            topic: 主题名称
+            frame: 发送事件
+        """
         if topic in self.subscriptions and self.subscriptions[topic]:
             disconnected_clients = []
             
-            for client_id in list(self.subscriptions[topic]):  # Use list() to avoid modification during iteration
-                if client_id in self.active_connections:
-                    try:
-                        websocket = self.active_connections[client_id]
-                        # Check if websocket is still connected
-                        if websocket.client_state.name == "CONNECTED":
-                            await websocket.send_json(message)
-                        else:
-                            logger.warning(f"WebSocket for {client_id} is not connected (state: {websocket.client_state.name})")
-                            disconnected_clients.append(client_id)
-                    except RuntimeError as e:
-                        if "WebSocket is not connected" in str(e):
-                            logger.debug(f"WebSocket for {client_id} already disconnected, skipping")
-                            disconnected_clients.append(client_id)
-                        else:
-                            logger.error(f"Error publishing to {client_id}: {e}")
-                            disconnected_clients.append(client_id)
-                    except Exception as e:
-                        logger.error(f"Error publishing to {client_id}: {e}")
-                        disconnected_clients.append(client_id)
+            # 直接遍历集合不做拷贝: 循环体只入队, 不会修改订阅关系, 断开的连接在循环后统一清理
+            clients = self._clients
+            for client_id in self.subscriptions[topic]:
+                conn = clients.get(client_id)
+                if conn is None:
+                    continue
+                # Check if websocket is still connected
+                if conn.websocket.client_state is _CONNECTED:
+                    conn.send(frame)
+                else:
+                    logger.warning(f"WebSocket for {client_id} is not connected (state: {conn.websocket.client_state.name})")
+                    disconnected_clients.append(client_id)
             
             # 清理断开的连接
             for client_id in disconnected_clients:
@@ -353,6 +723,46 @@ class WebSocketManager:
             # No subscribers, just log at debug level
             logger.debug(f"No subscribers for topic: {topic}, message saved to history")
     
+    def _append_history(self, topic: str, frame: Dict[str, str]):
+        """
+        写入主题历史, 并按全局字节预算淘汰最久未写入主题的旧消息
+        
+        Args:
+            topic: 主题名称
+            frame: 发送事件
+        """
+        if self.max_history_size <= 0:
+            # 不保留历史: deque(maxlen=0)什么也存不下, 不能计入字节数;
+            # 运行时被调成0时顺带丢弃该主题已有的历史
+            history = self.message_history.pop(topic, None)
+            if history:
+                self._history_bytes -= sum(sys.getsizeof(old["text"]) for old in history)
+            return
+        
+        history = self.message_history.get(topic)
+        if history is None:
+            history = self.message_history[topic] = deque(maxlen=self.max_history_size)
+        else:
+            self.message_history.move_to_end(topic)
+            if history.maxlen != self.max_history_size:
+                # max_history_size在运行时被调整过: 按新上限重建, 扣除被截掉的旧消息
+                for _ in range(len(history) - self.max_history_size):
+                    self._history_bytes -= sys.getsizeof(history.popleft()["text"])
+                history = self.message_history[topic] = deque(history, maxlen=self.max_history_size)
+            # deque满时append会挤掉最旧的一条, 先扣除它的大小
+            if len(history) == history.maxlen:
+                self._history_bytes -= sys.getsizeof(history[0]["text"])
+        
+        history.append(frame)
+        self._history_bytes += sys.getsizeof(frame["text"])
+        
+        while self._history_bytes > self.max_history_bytes and self.message_history:
+            oldest_topic, oldest_history = next(iter(self.message_history.items()))
+            if oldest_history:
+                self._history_bytes -= sys.getsizeof(oldest_history.popleft()["text"])
+            if not oldest_history:
+                del self.message_history[oldest_topic]
+    
     async def send_progress(
         self,
         topic: str,
@@ -368,13 +778,100 @@ class WebSocketManager:
             percentage: 进度百分比 (0.0-1.0)
             message: 进度消息
             details: 额外详情
+        
+        短时间内变化很小的进度会被合并, 只在progress_min_interval到期后发出最新一条;
+        100%进度总是立即发送
         """
-        await self.publish(topic, {
-            "type": MessageType.PROGRESS.value,
+        fields = {
             "percentage": percentage,
             "message": message,
-            "details": details or {}
-        })
+            "details": details or {},
+            "timestamp": _now_iso()
+        }
+        
+        now = time.monotonic()
+        last = self._progress_state.get(topic)
+        if (
+            percentage < 1.0
+            and last is not None
+            and abs(percentage - last[0]) < self.progress_min_delta
+            and now - last[1] < self.progress_min_interval
+        ):
+            self._pending_progress[topic] = (percentage, fields)
+            if topic not in self._progress_flush_handles:
+                self._progress_flush_handles[topic] = asyncio.get_running_loop().call_later(
+                    self.progress_min_interval - (now - last[1]),
+                    self._flush_progress,
+                    topic
+                )
+            return
+        
+        # 新进度取代尚未发出的旧进度
+        self._cancel_pending_progress(topic)
+        
+        if percentage >= 1.0:
+            self._progress_state.pop(topic, None)
+        else:
+            self._progress_state[topic] = (percentage, now)
+            if len(self._progress_state) >= self._progress_prune_at:
+                self._prune_progress_state(now)
+        
+        await self._dispatch(topic, _typed_frame(_PROGRESS_PREFIX, fields))
+    
+    def _prune_progress_state(self, now: float):
+        """
+        清理超过合并窗口的进度状态
+        
+        超过progress_min_interval的状态不会再触发合并, 与不存在等价;
+        任务失败或中止时进度到不了100%, 这些主题的条目在这里被回收
+        """
+        expired = [
+            topic for topic, (_, sent_at) in self._progress_state.items()
+            if now - sent_at >= self.progress_min_interval and topic not in self._pending_progress
+        ]
+        for topic in expired:
+            del self._progress_state[topic]
+        self._progress_prune_at = max(256, 2 * len(self._progress_state))
+    
+    def _drop_progress_state(self, topic: str):
+        """主题失去最后一个本地订阅者时丢弃其进度合并状态"""
+        self._progress_state.pop(topic, None)
+        # 启用跨worker后端时其他worker上可能还有订阅者, 待发送的合并进度照常发出
+        if not self.has_remote_backend():
+            self._cancel_pending_progress(topic)
+    
+    def _take_pending_progress(self, topic: str) -> Optional[Dict[str, str]]:
+        """取出该主题被合并的最新进度并序列化 (同时取消其定时发送)"""
+        handle = self._progress_flush_handles.pop(topic, None)
+        if handle is not None:
+            handle.cancel()
+        pending = self._pending_progress.pop(topic, None)
+        if pending is None:
+            return None
+        
+        percentage, fields = pending
+        self._progress_state[topic] = (percentage, time.monotonic())
+        return _typed_frame(_PROGRESS_PREFIX, fields)
+    
+    def _flush_progress(self, topic: str):
+        """定时回调: 发出该主题被合并的最新进度"""
+        progress = self._take_pending_progress(topic)
+        if progress is None:
+            return
+        
+        if self._redis is not None:
+            asyncio.get_running_loop().create_task(
+                self._redis_publish(f"topic:{topic}", progress)
+            )
+        else:
+            self._publish_local(topic, progress)
+    
+    def _cancel_pending_progress(self, topic: str):
+        """丢弃该主题尚未发出的合并进度"""
+        handle = self._progress_flush_handles.pop(topic, None)
+        if handle is not None:
+            handle.cancel()
+        self._pending_progress.pop(topic, None)
     
     async def send_status(
         self,
@@ -392,12 +889,12 @@ class WebSocketManager:
             message: 状态消息
             details: 额外详情
         """
-        await self.publish(topic, {
-            "type": MessageType.STATUS.value,
+        await self._publish_frame(topic, _typed_frame(_STATUS_PREFIX, {
             "status": status,
             "message": message,
-            "details": details or {}
-        })
+            "details": details or {},
+            "timestamp": _now_iso()
+        }))
     
     async def send_error(
         self,
@@ -413,11 +910,11 @@ class WebSocketManager:
             error_message: 错误消息
             error_details: 错误详情
         """
-        await self.publish(topic, {
-            "type": MessageType.ERROR.value,
+        await self._publish_frame(topic, _typed_frame(_ERROR_PREFIX, {
             "message": error_message,
-            "details": error_details or {}
-        })
+            "details": error_details or {},
+            "timestamp": _now_iso()
+        }))
     
     async def send_warning(
         self,
@@ -433,11 +930,11 @@ class WebSocketManager:
             warning_message: 警告消息
             warning_details: 警告详情
         """
-        await self.publish(topic, {
-            "type": MessageType.WARNING.value,
+        await self._publish_frame(topic, _typed_frame(_WARNING_PREFIX, {
             "message": warning_message,
-            "details": warning_details or {}
-        })
+            "details": warning_details or {},
+            "timestamp": _now_iso()
+        }))
     
     async def send_completion(
         self,
@@ -453,77 +950,177 @@ class WebSocketManager:
             message: 完成消息
             result: 结果数据
         """
-        await self.publish(topic, {
-            "type": MessageType.COMPLETE.value,
+        await self._publish_frame(topic, _typed_frame(_COMPLETE_PREFIX, {
             "message": message,
-            "result": result or {}
-        })
+            "result": result or {},
+            "timestamp": _now_iso()
+        }))
     
-    async def _heartbeat(self, client_id: str):
+    async def start_redis(self, url: Optional[str]) -> bool:
         """
-        心跳任务
+        启用Redis pub/sub后端
+        
+        启用后publish/broadcast_to_room/broadcast先发布到Redis, 每个worker订阅
+        ws:* 频道, 收到后只向本进程持有的连接扇出。调用方API不变。
         
         Args:
-            client_id: 客户端ID
+            url: Redis连接URL, 为空时保持单进程模式
+        
+        Returns:
+            是否已启用
+        """
+        if not url:
+            return False
+        if not REDIS_AVAILABLE:
+            logger.warning("redis package not installed, WebSocket fan-out stays in-process")
+            return False
+        if self._redis is not None:
+            return True
+        
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._pubsub_task = asyncio.create_task(self._pubsub_loop())
+        logger.info(f"WebSocket fan-out via Redis pub/sub: {url}")
+        return True
+    
+    async def stop_redis(self):
+        """停止Redis pub/sub后端, 回到单进程模式"""
+        if self._pubsub_task is not None:
+            # 等订阅循环退出后再关闭连接, 避免它仍在使用正被关闭的连接
+            pubsub_task, self._pubsub_task = self._pubsub_task, None
+            pubsub_task.cancel()
+            await asyncio.gather(pubsub_task, return_exceptions=True)
+        if self._redis is not None:
+            redis_client, self._redis = self._redis, None
+            await redis_client.aclose()
+    
+    def has_remote_backend(self) -> bool:
+        """
+        是否启用了跨worker扇出的后端
+        
+        启用时房间/主题的订阅者可能在其他worker上, 本地计数为0不代表没有接收者
+        """
+        return self._redis is not None
+    
+    async def _redis_publish(self, channel: str, frame: Dict[str, str]):
+        """
+        发布到Redis频道; Redis不可用时退回本地扇出, 不丢消息
+        
+        Args:
+            channel: 频道名 (不含前缀)
+            frame: 发送事件 (发布其中已序列化的文本)
         """
         try:
-            while True:
-                await asyncio.sleep(30)  # 每30秒发送一次心跳
-                
-                if client_id in self.active_connections:
+            await self._redis.publish(_REDIS_CHANNEL_PREFIX + channel, frame["text"])
+        except Exception as e:
+            logger.error(f"Redis publish failed on {channel}, delivering locally: {e}")
+            self._deliver_local(channel, frame)
+    
+    async def _pubsub_loop(self):
+        """订阅 ws:* 频道, 把收到的消息交给本地扇出; 连接出错时重新订阅"""
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(_REDIS_CHANNEL_PREFIX + "*")
+                async for item in pubsub.listen():
+                    if item["type"] != "pmessage":
+                        continue
                     try:
-                        await self.active_connections[client_id].send_json({
-                            "type": MessageType.HEARTBEAT.value,
-                            "timestamp": datetime.utcnow().isoformat()
-                        })
+                        self._deliver_local(
+                            item["channel"][len(_REDIS_CHANNEL_PREFIX):],
+                            _text_frame(item["data"])
+                        )
                     except Exception as e:
-                        logger.error(f"Heartbeat failed for {client_id}: {e}")
-                        self.disconnect(client_id)
-                        break
-                else:
+                        logger.error(f"Error handling Redis message on {item['channel']}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis pub/sub connection error, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+    
+    def _deliver_local(self, channel: str, frame: Dict[str, str]):
+        """
+        按频道把消息交给本进程的扇出逻辑
+        
+        Args:
+            channel: topic:{topic} / room:{room} / all
+            frame: 发送事件
+        """
+        kind, _, name = channel.partition(":")
+        if kind == "topic":
+            self._publish_local(name, frame)
+        elif kind == "room":
+            self._broadcast_to_room_local(name, frame)
+        elif kind == "all":
+            self._broadcast_local(frame)
+        else:
+            logger.warning(f"Unknown WebSocket channel: {channel}")
+    
+    async def _heartbeat(self):
+        """
+        全局心跳任务: 每个周期序列化一次心跳帧, 发送给所有连接
+        
+        顺带清理状态已不是CONNECTED的连接; 没有连接时退出, 下次connect时重新启动
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat_interval)
+                
+                if not self.active_connections:
                     break
+                
+                self._broadcast_local(_typed_frame(_HEARTBEAT_PREFIX, {"timestamp": _now_iso()}))
         except asyncio.CancelledError:
-            logger.debug(f"Heartbeat task cancelled for {client_id}")
+            logger.debug("Heartbeat task cancelled")
     
-    async def _send_history(self, client_id: str, topic: str):
+    def _send_history(self, client_id: str, topic: str):
         """
         发送历史消息
         
+        整段历史同步放入客户端的发送队列, 由写协程连续写出;
+        慢客户端由socket自身的背压限速, 不再人为sleep。
+        回放量以发送队列的剩余容量为上限, 只放入最新的一段,
+        避免回放自己把队列挤满再逐条丢旧
+        
         Args:
             client_id: 客户端ID
             topic: 主题名称
         """
-        if topic in self.message_history and client_id in self.active_connections:
-            try:
-                # 发送历史消息标记
-                await self.send_personal_message(client_id, {
-                    "type": MessageType.INFO.value,
-                    "message": f"Sending {len(self.message_history[topic])} historical messages for topic: {topic}",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                
-                # 发送历史消息
-                for message in self.message_history[topic]:
-                    await self.send_personal_message(client_id, message)
-                    await asyncio.sleep(0.01)  # 避免消息过快
-                
-            except Exception as e:
-                logger.error(f"Error sending history to {client_id}: {e}")
+        history = self.message_history.get(topic)
+        conn = self._clients.get(client_id)
+        if not history or conn is None:
+            return
+        
+        try:
+            # 队列高水位: 扣掉标记消息本身占的一格
+            queue = conn.queue
+            capacity = queue.maxsize - queue.qsize() - 1 if queue.maxsize > 0 else len(history)
+            skip = max(len(history) - max(capacity, 0), 0)
+            
+            # 发送历史消息标记
+            conn.send(_typed_frame(_INFO_PREFIX, {
+                "message": f"Sending {len(history) - skip} historical messages for topic: {topic}",
+                "timestamp": _now_iso()
+            }))
+            
+            # 历史中存的就是发送事件, 直接回放
+            for frame in islice(history, skip, None):
+                conn.send(frame)
+            
+        except Exception as e:
+            logger.error(f"Error sending history to {client_id}: {e}")
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get comprehensive statistics"""
+        """Get comprehensive statistics (counters are maintained incrementally)"""
         return {
             "total_connections": len(self.active_connections),
             "total_rooms": len(self.rooms),
-            "total_subscriptions": sum(len(subs) for subs in self.subscriptions.values()),
-            "rooms": list(self.rooms.keys()),
-            "room_client_count": {
-                room: len(clients) for room, clients in self.rooms.items()
-            },
-            "topics": list(self.subscriptions.keys()),
-            "topic_subscriber_count": {
-                topic: len(subs) for topic, subs in self.subscriptions.items()
-            }
+            "total_subscriptions": self._total_subscriptions,
+            "rooms": list(self.rooms),
+            "room_client_count": dict(self._room_sizes),
+            "topics": list(self.subscriptions),
+            "topic_subscriber_count": dict(self._topic_sizes)
         }
     
     def get_client_info(self, client_id: str) -> Optional[Dict[str, Any]]:
@@ -543,10 +1140,7 @@ class WebSocketManager:
             "client_id": client_id,
             "connected": True,
             "rooms": list(self.client_rooms.get(client_id, set())),
-            "subscriptions": [
-                topic for topic, subs in self.subscriptions.items()
-                if client_id in subs
-            ],
+            "subscriptions": list(self.client_topics.get(client_id, set())),
             "metadata": self.connection_metadata.get(client_id, {})
         }
 
@@ -610,4 +1204,16 @@ def create_progress_websocket_callback(
         异步回调函数
     """
     callback = ProgressWebSocketCallback(topic, manager)
-    return callback
\ No newline at end of file
+    return callback
+
+async def send_json(websocket: WebSocket, message: Dict[str, Any]):
+    """
+    用管理器的序列化器 (orjson优先) 直接发送一条JSON文本帧
+    
+    供不经过WebSocketManager的端点使用, 替代Starlette send_json内部的json.dumps
+    
+    Args:
+        websocket: WebSocket连接
+        message: 消息内容
+    """
+    await websocket.send(_frame(message))
@@ -5,7 +5,8 @@ Conversational Episode Workflow Engine
 管理从创意/剧本到成片的完整对话式生产流程
 """
 from enum import Enum
-from typing import Optional, Dict, Any, List
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple, Set, Callable
 from datetime import datetime
 import json
 import asyncio
@@ -50,6 +51,132 @@ class WorkflowAction(str, Enum):
     NEXT = "next"  # 进入下一步
 
 
+# 状态 -> 步骤名称 / 描述 / 进度 / 允许的下一状态
+# 模块级只读映射, 导入时构建一次, 各方法直接查表不再每次重建字典
+_STEP_NAMES = MappingProxyType({
+    WorkflowState.INITIAL: "初始化",
+    WorkflowState.OUTLINE_GENERATING: "生成剧本大纲",
+    WorkflowState.OUTLINE_GENERATED: "剧本大纲已生成",
+    WorkflowState.OUTLINE_CONFIRMED: "剧本大纲已确认",
+    WorkflowState.REFINING: "细化剧情内容",
+    WorkflowState.REFINED: "剧情内容已细化",
+    WorkflowState.CHARACTERS_GENERATING: "生成角色设计",
+    WorkflowState.CHARACTERS_GENERATED: "角色设计已生成",
+    WorkflowState.CHARACTERS_CONFIRMED: "角色设计已确认",
+    WorkflowState.SCENES_GENERATING: "生成场景设计",
+    WorkflowState.SCENES_GENERATED: "场景设计已生成",
+    WorkflowState.SCENES_CONFIRMED: "场景设计已确认",
+    WorkflowState.STORYBOARD_GENERATING: "生成分镜剧本",
+    WorkflowState.STORYBOARD_GENERATED: "分镜剧本已生成",
+    WorkflowState.STORYBOARD_CONFIRMED: "分镜剧本已确认",
+    WorkflowState.VIDEO_GENERATING: "生成视频",
+    WorkflowState.VIDEO_COMPLETED: "视频生成完成",
+    WorkflowState.FAILED: "失败",
+    WorkflowState.CANCELLED: "已取消",
+})
+
+_STEP_DESCRIPTIONS = MappingProxyType({
+    WorkflowState.INITIAL: "准备开始生成剧本大纲",
+    WorkflowState.OUTLINE_GENERATING: "AI正在根据您的创意生成剧本大纲，包括基础信息、主要角色和情节概要...",
+    WorkflowState.OUTLINE_GENERATED: "剧本大纲已生成完成，请在右侧查看并确认",
+    WorkflowState.OUTLINE_CONFIRMED: "剧本大纲已确认，准备细化剧情内容",
+    WorkflowState.REFINING: "AI正在细化本集的剧情内容，包括故事梗概、剧本亮点和美术风格...",
+    WorkflowState.REFINED: "剧情内容已细化完成，准备生成角色设计",
+    WorkflowState.CHARACTERS_GENERATING: "AI正在设计角色造型并生成角色图片...",
+    WorkflowState.CHARACTERS_GENERATED: "角色设计已完成，请在右侧查看角色卡片",
+    WorkflowState.CHARACTERS_CONFIRMED: "角色设计已确认，准备生成场景设计",
+    WorkflowState.SCENES_GENERATING: "AI正在设计场景并生成场景图片...",
+    WorkflowState.SCENES_GENERATED: "场景设计已完成，请在右侧查看场景列表",
+    WorkflowState.SCENES_CONFIRMED: "场景设计已确认，准备生成分镜剧本",
+    WorkflowState.STORYBOARD_GENERATING: "AI正在绘制详细的分镜剧本...",
+    WorkflowState.STORYBOARD_GENERATED: "分镜剧本已完成，请在右侧查看分镜表",
+    WorkflowState.STORYBOARD_CONFIRMED: "分镜剧本已确认，准备开始视频生成",
+    WorkflowState.VIDEO_GENERATING: "正在生成视频，这可能需要一些时间...",
+    WorkflowState.VIDEO_COMPLETED: "视频生成完成！",
+    WorkflowState.FAILED: "生成过程中出现错误",
+    WorkflowState.CANCELLED: "工作流已被取消",
+})
+
+_PROGRESS_MAP = MappingProxyType({
+    WorkflowState.INITIAL: 0,
+    WorkflowState.OUTLINE_GENERATING: 5,
+    WorkflowState.OUTLINE_GENERATED: 10,
+    WorkflowState.OUTLINE_CONFIRMED: 15,
+    WorkflowState.REFINING: 20,
+    WorkflowState.REFINED: 25,
+    WorkflowState.CHARACTERS_GENERATING: 30,
+    WorkflowState.CHARACTERS_GENERATED: 40,
+    WorkflowState.CHARACTERS_CONFIRMED: 45,
+    WorkflowState.SCENES_GENERATING: 50,
+    WorkflowState.SCENES_GENERATED: 60,
+    WorkflowState.SCENES_CONFIRMED: 65,
+    WorkflowState.STORYBOARD_GENERATING: 70,
+    WorkflowState.STORYBOARD_GENERATED: 80,
+    WorkflowState.STORYBOARD_CONFIRMED: 85,
+    WorkflowState.VIDEO_GENERATING: 90,
+    WorkflowState.VIDEO_COMPLETED: 100,
+})
+
+_VALID_TRANSITIONS = MappingProxyType({
+    WorkflowState.INITIAL: frozenset({WorkflowState.OUTLINE_GENERATING}),
+    WorkflowState.OUTLINE_GENERATING: frozenset({WorkflowState.OUTLINE_GENERATED, WorkflowState.FAILED}),
+    WorkflowState.OUTLINE_GENERATED: frozenset({WorkflowState.OUTLINE_CONFIRMED, WorkflowState.OUTLINE_GENERATING}),
+    WorkflowState.OUTLINE_CONFIRMED: frozenset({WorkflowState.REFINING}),
+    WorkflowState.REFINING: frozenset({WorkflowState.REFINED, WorkflowState.FAILED}),
+    WorkflowState.REFINED: frozenset({WorkflowState.CHARACTERS_GENERATING}),
+    WorkflowState.CHARACTERS_GENERATING: frozenset({WorkflowState.CHARACTERS_GENERATED, WorkflowState.FAILED}),
+    WorkflowState.CHARACTERS_GENERATED: frozenset({WorkflowState.CHARACTERS_CONFIRMED, WorkflowState.CHARACTERS_GENERATING}),
+    WorkflowState.CHARACTERS_CONFIRMED: frozenset({WorkflowState.SCENES_GENERATING}),
+    WorkflowState.SCENES_GENERATING: frozenset({WorkflowState.SCENES_GENERATED, WorkflowState.FAILED}),
+    WorkflowState.SCENES_GENERATED: frozenset({WorkflowState.SCENES_CONFIRMED, WorkflowState.SCENES_GENERATING}),
+    WorkflowState.SCENES_CONFIRMED: frozenset({WorkflowState.STORYBOARD_GENERATING}),
+    WorkflowState.STORYBOARD_GENERATING: frozenset({WorkflowState.STORYBOARD_GENERATED, WorkflowState.FAILED}),
+    WorkflowState.STORYBOARD_GENERATED: frozenset({WorkflowState.STORYBOARD_CONFIRMED, WorkflowState.STORYBOARD_GENERATING}),
+    WorkflowState.STORYBOARD_CONFIRMED: frozenset({WorkflowState.VIDEO_GENERATING}),
+    WorkflowState.VIDEO_GENERATING: frozenset({WorkflowState.VIDEO_COMPLETED, WorkflowState.FAILED}),
+    WorkflowState.FAILED: frozenset({
+        WorkflowState.INITIAL,
+        WorkflowState.OUTLINE_GENERATING,
+        WorkflowState.CHARACTERS_GENERATING,
+        WorkflowState.SCENES_GENERATING,
+        WorkflowState.STORYBOARD_GENERATING,
+        WorkflowState.VIDEO_GENERATING,
+    }),
+})
+
+
+# 等待用户审核的状态 / 正在生成中的状态, 及其对应的可用操作
+_REVIEW_STATES = frozenset({
+    WorkflowState.OUTLINE_GENERATED,
+    WorkflowState.CHARACTERS_GENERATED,
+    WorkflowState.SCENES_GENERATED,
+    WorkflowState.STORYBOARD_GENERATED,
+})
+
+_BUSY_STATES = frozenset({
+    WorkflowState.OUTLINE_GENERATING,
+    WorkflowState.REFINING,
+    WorkflowState.CHARACTERS_GENERATING,
+    WorkflowState.SCENES_GENERATING,
+    WorkflowState.STORYBOARD_GENERATING,
+    WorkflowState.VIDEO_GENERATING,
+})
+
+_REVIEW_ACTIONS = (WorkflowAction.CONFIRM, WorkflowAction.EDIT, WorkflowAction.REGENERATE)
+_BUSY_ACTIONS = (WorkflowAction.CANCEL,)
+_DEFAULT_ACTIONS = (WorkflowAction.NEXT,)
+
+
+def _enum_member(enum_cls, value):
+    """
+    按值取枚举成员
+    
+    直接查 _value2member_map_ (str枚举的成员本身也能命中), 跳过Enum构造的调用链;
+    未命中时回退到 enum_cls(value), 保留原来的ValueError
+    """
+    member = enum_cls._value2member_map_.get(value)
+    return member if member is not None else enum_cls(value)
+
 class OutlineData(BaseModel):
     """剧本大纲数据"""
     title: str
@@ -95,6 +222,23 @@ class ShotData(BaseModel):
 class ConversationalEpisodeWorkflow:
     """对话式集数生产工作流"""
     
+    # 固定属性集合, 每个实例不再携带__dict__
+    __slots__ = (
+        "episode_id",
+        "mode",
+        "initial_content",
+        "style",
+        "_state",
+        "_state_listener",
+        "context",
+        "outline",
+        "refined_content",
+        "characters",
+        "scenes",
+        "storyboard",
+        "error",
+    )
+    
     def __init__(
         self,
         episode_id: int,
@@ -106,7 +250,9 @@ class ConversationalEpisodeWorkflow:
         self.mode = mode
         self.initial_content = initial_content
         self.style = style
-        self.state = WorkflowState.INITIAL
+        # 状态变化回调 (由WorkflowManager注册, 用于维护按状态的索引)
+        self._state_listener: Optional[Callable[["ConversationalEpisodeWorkflow", WorkflowState, WorkflowState], None]] = None
+        self._state = WorkflowState.INITIAL
         self.context: Dict[str, Any] = {
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
@@ -125,6 +271,18 @@ class ConversationalEpisodeWorkflow:
         # 错误信息
         self.error: Optional[str] = None
     
+    @property
+    def state(self) -> WorkflowState:
+        """当前状态"""
+        return self._state
+    
+    @state.setter
+    def state(self, new_state: WorkflowState):
+        old_state = self._state
+        self._state = new_state
+        if self._state_listener is not None and new_state != old_state:
+            self._state_listener(self, old_state, new_state)
+    
     def get_current_step_info(self) -> Dict[str, Any]:
         """获取当前步骤信息"""
         step_info = {
@@ -138,133 +296,31 @@ class ConversationalEpisodeWorkflow:
     
     def _get_step_name(self) -> str:
         """获取步骤名称"""
-        step_names = {
-            WorkflowState.INITIAL: "初始化",
-            WorkflowState.OUTLINE_GENERATING: "生成剧本大纲",
-            WorkflowState.OUTLINE_GENERATED: "剧本大纲已生成",
-            WorkflowState.OUTLINE_CONFIRMED: "剧本大纲已确认",
-            WorkflowState.REFINING: "细化剧情内容",
-            WorkflowState.REFINED: "剧情内容已细化",
-            WorkflowState.CHARACTERS_GENERATING: "生成角色设计",
-            WorkflowState.CHARACTERS_GENERATED: "角色设计已生成",
-            WorkflowState.CHARACTERS_CONFIRMED: "角色设计已确认",
-            WorkflowState.SCENES_GENERATING: "生成场景设计",
-            WorkflowState.SCENES_GENERATED: "场景设计已生成",
-            WorkflowState.SCENES_CONFIRMED: "场景设计已确认",
-            WorkflowState.STORYBOARD_GENERATING: "生成分镜剧本",
-            WorkflowState.STORYBOARD_GENERATED: "分镜剧本已生成",
-            WorkflowState.STORYBOARD_CONFIRMED: "分镜剧本已确认",
-            WorkflowState.VIDEO_GENERATING: "生成视频",
-            WorkflowState.VIDEO_COMPLETED: "视频生成完成",
-            WorkflowState.FAILED: "失败",
-            WorkflowState.CANCELLED: "已取消",
-        }
-        return step_names.get(self.state, "未知状态")
+        return _STEP_NAMES.get(self.state, "未知状态")
     
     def _get_step_description(self) -> str:
         """获取步骤描述"""
-        descriptions = {
-            WorkflowState.INITIAL: "准备开始生成剧本大纲",
-            WorkflowState.OUTLINE_GENERATING: "AI正在根据您的创意生成剧本大纲，包括基础信息、主要角色和情节概要...",
-            WorkflowState.OUTLINE_GENERATED: "剧本大纲已生成完成，请在右侧查看并确认",
-            WorkflowState.OUTLINE_CONFIRMED: "剧本大纲已确认，准备细化剧情内容",
-            WorkflowState.REFINING: "AI正在细化本集的剧情内容，包括故事梗概、剧本亮点和美术风格...",
-            WorkflowState.REFINED: "剧情内容已细化完成，准备生成角色设计",
-            WorkflowState.CHARACTERS_GENERATING: "AI正在设计角色造型并生成角色图片...",
-            WorkflowState.CHARACTERS_GENERATED: "角色设计已完成，请在右侧查看角色卡片",
-            WorkflowState.CHARACTERS_CONFIRMED: "角色设计已确认，准备生成场景设计",
-            WorkflowState.SCENES_GENERATING: "AI正在设计场景并生成场景图片...",
-            WorkflowState.SCENES_GENERATED: "场景设计已完成，请在右侧查看场景列表",
-            WorkflowState.SCENES_CONFIRMED: "场景设计已确认，准备生成分镜剧本",
-            WorkflowState.STORYBOARD_GENERATING: "AI正在绘制详细的分镜剧本...",
-            WorkflowState.STORYBOARD_GENERATED: "分镜剧本已完成，请在右侧查看分镜表",
-            WorkflowState.STORYBOARD_CONFIRMED: "分镜剧本已确认，准备开始视频生成",
-            WorkflowState.VIDEO_GENERATING: "正在生成视频，这可能需要一些时间...",
-            WorkflowState.VIDEO_COMPLETED: "视频生成完成！",
-            WorkflowState.FAILED: "生成过程中出现错误",
-            WorkflowState.CANCELLED: "工作流已被取消",
-        }
-        return descriptions.get(self.state, "")
+        return _STEP_DESCRIPTIONS.get(self.state, "")
     
-    def _get_available_actions(self) -> List[str]:
+    def _get_available_actions(self) -> Tuple[str, ...]:
         """获取当前可用的操作"""
-        # 根据状态返回可用操作
-        if self.state in [
-            WorkflowState.OUTLINE_GENERATED,
-            WorkflowState.CHARACTERS_GENERATED,
-            WorkflowState.SCENES_GENERATED,
-            WorkflowState.STORYBOARD_GENERATED,
-        ]:
-            return [WorkflowAction.CONFIRM, WorkflowAction.EDIT, WorkflowAction.REGENERATE]
-        elif self.state in [
-            WorkflowState.OUTLINE_GENERATING,
-            WorkflowState.REFINING,
-            WorkflowState.CHARACTERS_GENERATING,
-            WorkflowState.SCENES_GENERATING,
-            WorkflowState.STORYBOARD_GENERATING,
-            WorkflowState.VIDEO_GENERATING,
-        ]:
-            return [WorkflowAction.CANCEL]
+        # 根据状态返回可用操作 (预先构建的只读元组, 各实例共用)
+        if self.state in _REVIEW_STATES:
+            return _REVIEW_ACTIONS
+        elif self.state in _BUSY_STATES:
+            return _BUSY_ACTIONS
         elif self.state == WorkflowState.VIDEO_COMPLETED:
-            return []
+            return ()
         else:
-            return [WorkflowAction.NEXT]
+            return _DEFAULT_ACTIONS
     
     def _calculate_progress(self) -> float:
         """计算整体进度百分比"""
-        progress_map = {
-            WorkflowState.INITIAL: 0,
-            WorkflowState.OUTLINE_GENERATING: 5,
-            WorkflowState.OUTLINE_GENERATED: 10,
-            WorkflowState.OUTLINE_CONFIRMED: 15,
-            WorkflowState.REFINING: 20,
-            WorkflowState.REFINED: 25,
-            WorkflowState.CHARACTERS_GENERATING: 30,
-            WorkflowState.CHARACTERS_GENERATED: 40,
-            WorkflowState.CHARACTERS_CONFIRMED: 45,
-            WorkflowState.SCENES_GENERATING: 50,
-            WorkflowState.SCENES_GENERATED: 60,
-            WorkflowState.SCENES_CONFIRMED: 65,
-            WorkflowState.STORYBOARD_GENERATING: 70,
-            WorkflowState.STORYBOARD_GENERATED: 80,
-            WorkflowState.STORYBOARD_CONFIRMED: 85,
-            WorkflowState.VIDEO_GENERATING: 90,
-            WorkflowState.VIDEO_COMPLETED: 100,
-        }
-        return progress_map.get(self.state, 0)
+        return _PROGRESS_MAP.get(self.state, 0)
     
     def can_transition_to(self, new_state: WorkflowState) -> bool:
         """检查是否可以转换到新状态"""
-        # 定义状态转换规则
-        valid_transitions = {
-            WorkflowState.INITIAL: [WorkflowState.OUTLINE_GENERATING],
-            WorkflowState.OUTLINE_GENERATING: [WorkflowState.OUTLINE_GENERATED, WorkflowState.FAILED],
-            WorkflowState.OUTLINE_GENERATED: [WorkflowState.OUTLINE_CONFIRMED, WorkflowState.OUTLINE_GENERATING],
-            WorkflowState.OUTLINE_CONFIRMED: [WorkflowState.REFINING],
-            WorkflowState.REFINING: [WorkflowState.REFINED, WorkflowState.FAILED],
-            WorkflowState.REFINED: [WorkflowState.CHARACTERS_GENERATING],
-            WorkflowState.CHARACTERS_GENERATING: [WorkflowState.CHARACTERS_GENERATED, WorkflowState.FAILED],
-            WorkflowState.CHARACTERS_GENERATED: [WorkflowState.CHARACTERS_CONFIRMED, WorkflowState.CHARACTERS_GENERATING],
-            WorkflowState.CHARACTERS_CONFIRMED: [WorkflowState.SCENES_GENERATING],
-            WorkflowState.SCENES_GENERATING: [WorkflowState.SCENES_GENERATED, WorkflowState.FAILED],
-            WorkflowState.SCENES_GENERATED: [WorkflowState.SCENES_CONFIRMED, WorkflowState.SCENES_GENERATING],
-            WorkflowState.SCENES_CONFIRMED: [WorkflowState.STORYBOARD_GENERATING],
-            WorkflowState.STORYBOARD_GENERATING: [WorkflowState.STORYBOARD_GENERATED, WorkflowState.FAILED],
-            WorkflowState.STORYBOARD_GENERATED: [WorkflowState.STORYBOARD_CONFIRMED, WorkflowState.STORYBOARD_GENERATING],
-            WorkflowState.STORYBOARD_CONFIRMED: [WorkflowState.VIDEO_GENERATING],
-            WorkflowState.VIDEO_GENERATING: [WorkflowState.VIDEO_COMPLETED, WorkflowState.FAILED],
-            WorkflowState.FAILED: [
-                WorkflowState.INITIAL,
-                WorkflowState.OUTLINE_GENERATING,
-                WorkflowState.CHARACTERS_GENERATING,
-                WorkflowState.SCENES_GENERATING,
-                WorkflowState.STORYBOARD_GENERATING,
-                WorkflowState.VIDEO_GENERATING,
-            ],
-        }
-        
-        allowed_states = valid_transitions.get(self.state, [])
-        return new_state in allowed_states
+        return new_state in _VALID_TRANSITIONS.get(self.state, ())
     
     def transition_to(self, new_state: WorkflowState) -> bool:
         """转换到新状态"""
@@ -289,11 +345,11 @@ class ConversationalEpisodeWorkflow:
             "state": self.state,
             "style": self.style,
             "context": self.context,
-            "outline": self.outline.dict() if self.outline else None,
+            "outline": self.outline.model_dump() if self.outline else None,
             "refined_content": self.refined_content,
-            "characters": [c.dict() for c in self.characters],
-            "scenes": [s.dict() for s in self.scenes],
-            "storyboard": [shot.dict() for shot in self.storyboard],
+            "characters": [c.model_dump() for c in self.characters],
+            "scenes": [s.model_dump() for s in self.scenes],
+            "storyboard": [shot.model_dump() for shot in self.storyboard],
             "error": self.error,
             "step_info": self.get_current_step_info(),
         }
@@ -303,11 +359,11 @@ class ConversationalEpisodeWorkflow:
         """从字典创建实例"""
         workflow = cls(
             episode_id=data["episode_id"],
-            mode=WorkflowMode(data["mode"]),
+            mode=_enum_member(WorkflowMode, data["mode"]),
             initial_content=data.get("context", {}).get("initial_content", ""),
             style=data.get("style", "写实电影感"),
         )
-        workflow.state = WorkflowState(data["state"])
+        workflow.state = _enum_member(WorkflowState, data["state"])
         workflow.context = data.get("context", {})
         
         if data.get("outline"):
@@ -334,6 +390,43 @@ class WorkflowManager:
     
     def __init__(self):
         self.workflows: Dict[int, ConversationalEpisodeWorkflow] = {}
+        # 按状态的索引: {state: Set[episode_id]}, 随工作流状态变化增量维护
+        self._by_state: Dict[WorkflowState, Set[int]] = {}
+    
+    def add_workflow(self, workflow: ConversationalEpisodeWorkflow):
+        """登记工作流 (替换同一episode_id的旧实例), 并跟踪其状态变化"""
+        episode_id = workflow.episode_id
+        previous = self.workflows.get(episode_id)
+        if previous is not None and previous is not workflow:
+            self._unindex(previous)
+        
+        self.workflows[episode_id] = workflow
+        self._by_state.setdefault(workflow.state, set()).add(episode_id)
+        workflow._state_listener = self._on_state_change
+    
+    def _unindex(self, workflow: ConversationalEpisodeWorkflow):
+        """从状态索引中移除工作流并解除状态回调"""
+        workflow._state_listener = None
+        episode_ids = self._by_state.get(workflow.state)
+        if episode_ids is not None:
+            episode_ids.discard(workflow.episode_id)
+            if not episode_ids:
+                del self._by_state[workflow.state]
+    
+    def _on_state_change(
+        self,
+        workflow: ConversationalEpisodeWorkflow,
+        old_state: WorkflowState,
+        new_state: WorkflowState
+    ):
+        """工作流状态变化回调: 把episode_id从旧状态移到新状态"""
+        episode_id = workflow.episode_id
+        episode_ids = self._by_state.get(old_state)
+        if episode_ids is not None:
+            episode_ids.discard(episode_id)
+            if not episode_ids:
+                del self._by_state[old_state]
+        self._by_state.setdefault(new_state, set()).add(episode_id)
     
     def create_workflow(
         self,
@@ -349,7 +442,7 @@ class WorkflowManager:
             initial_content=initial_content,
             style=style
         )
-        self.workflows[episode_id] = workflow
+        self.add_workflow(workflow)
         return workflow
     
     def get_workflow(self, episode_id: int) -> Optional[ConversationalEpisodeWorkflow]:
@@ -382,12 +475,12 @@ class WorkflowManager:
         
         workflow = ConversationalEpisodeWorkflow(
             episode_id=episode_id,
-            mode=WorkflowMode(session.mode),
+            mode=_enum_member(WorkflowMode, session.mode),
             initial_content=session.initial_content or "",
             style=session.style or "写实电影感"
         )
         
-        workflow.state = WorkflowState(session.state)
+        workflow.state = _enum_member(WorkflowState, session.state)
         workflow.context = session.context or {}
         workflow.context["episode_id_str"] = episode_id_str
         workflow.error = session.error_message
@@ -499,15 +592,16 @@ class WorkflowManager:
         except (ValueError, AttributeError):
             pass
         
-        self.workflows[episode_id] = workflow
+        self.add_workflow(workflow)
         print(f"[WorkflowManager] Restored workflow from database: episode={episode_id_str}, state={workflow.state}, storyboard_count={len(workflow.storyboard)}")
         
         return workflow
     
     def remove_workflow(self, episode_id: int):
         """移除工作流"""
-        if episode_id in self.workflows:
-            del self.workflows[episode_id]
+        workflow = self.workflows.pop(episode_id, None)
+        if workflow is not None:
+            self._unindex(workflow)
     
     def list_workflows(self) -> List[Dict[str, Any]]:
         """列出所有工作流"""
@@ -516,10 +610,25 @@ class WorkflowManager:
                 "episode_id": wf.episode_id,
                 "state": wf.state,
                 "mode": wf.mode,
-                "progress": wf._calculate_progress(),
+                "progress": _PROGRESS_MAP.get(wf.state, 0),
             }
             for wf in self.workflows.values()
         ]
+    
+    def list_workflows_by_state(self, state: WorkflowState) -> List[Dict[str, Any]]:
+        """列出处于指定状态的工作流 (查状态索引, 只遍历匹配的工作流)"""
+        state = _enum_member(WorkflowState, state)
+        progress = _PROGRESS_MAP.get(state, 0)
+        workflows = self.workflows
+        return [
+            {
+                "episode_id": episode_id,
+                "state": state,
+                "mode": workflows[episode_id].mode,
+                "progress": progress,
+            }
+            for episode_id in self._by_state.get(state, ())
+        ]
 
 
 # 全局工作流管理器实例
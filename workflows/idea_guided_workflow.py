@@ -11,13 +11,27 @@ Transforms initial creative ideas into complete video concepts through:
 """
 
 import asyncio
+import functools
+import inspect
 import logging
-from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import MISSING, dataclass, field, fields
+from typing import List, Optional, Dict, Any, Callable, Tuple, Union, get_type_hints, get_origin, get_args
 from enum import Enum
 from datetime import datetime
 import json
 import os
+import re
+import sys
+import tempfile
+from types import MappingProxyType
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 from langchain.chat_models import init_chat_model
 from interfaces.character import CharacterInScene
@@ -74,11 +88,307 @@ class PacingPreference(str, Enum):
     VARIED = "varied"
 
 
+# member -> interned value; a dict hit is cheaper than Enum's .value
+# property on the notify/refine/summary/prompt paths.
+_STAGE_VALUE = MappingProxyType({s: sys.intern(s.value) for s in WorkflowStage})
+_CD_VALUE = MappingProxyType({c: sys.intern(c.value) for c in CreativeDirection})
+_VS_VALUE = MappingProxyType({v: sys.intern(v.value) for v in VisualStyle})
+_PP_VALUE = MappingProxyType({p: sys.intern(p.value) for p in PacingPreference})
+
+
+# State persistence: deltas are appended to a JSON-lines log and folded into
+# a full snapshot every DELTA_COMPACT_EVERY records or once the log grows
+# past DELTA_LOG_MAX_BYTES.
+STATE_FILE_NAME = "workflow_state.json"
+DELTA_LOG_NAME = "workflow_state.deltas.jsonl"
+DELTA_COMPACT_EVERY = 20
+DELTA_LOG_MAX_BYTES = 1 << 20
+
+# Keys that never change after a state is created; their encoding is cached
+# and spliced into every compact snapshot (WorkflowState._static_encoding).
+_STATIC_KEYS = frozenset(("workflow_id", "created_at"))
+
+# workflow_id/checkpoint_seq/current_stage lead every snapshot (created_at
+# may sit between them), so the header is recoverable from a short prefix of
+# the file.
+_HEADER_PROBE_BYTES = 512
+_HEADER_RE = re.compile(rb'(?<!\\)"(workflow_id|current_stage)"\s*:\s*("(?:[^"\\]|\\.)*")')
+_HEADER_SEQ_RE = re.compile(rb'(?<!\\)"checkpoint_seq"\s*:\s*(\d+)')
+# One delta record per line, always starting with its seq
+_DELTA_STAGE_RE = re.compile(
+    rb'^\{"seq":(\d+),.*?(?<!\\)"current_stage":("(?:[^"\\]|\\.)*")', re.MULTILINE
+)
+
+
+def _json_default(obj: Any) -> Any:
+    """stdlib json fallback for the types orjson encodes natively."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps_compact(obj: Any) -> bytes:
+    """Compact single-line JSON bytes (orjson when available)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# One writer thread: save_async() calls are applied in submission order, so a
+# snapshot can never land after a later delta.
+_SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow-save")
+
+
+def _apply_writes(working_dir: str, writes: List[Tuple[str, str, bytes]]):
+    """
+    Perform the file writes planned by WorkflowState._plan_save.
+    
+    mode is an open() mode, or "replace" for the snapshot: every delta
+    depends on it, so it is written to a temp file in the same directory
+    and swapped in with os.replace. A crash mid-write leaves the previous
+    snapshot (and its delta log) intact.
+    """
+    os.makedirs(working_dir, exist_ok=True)
+    for path, mode, payload in writes:
+        if mode == "replace":
+            _replace_file(path, payload)
+        else:
+            with open(path, mode) as f:
+                f.write(payload)
+
+
+def _replace_file(path: str, payload: bytes):
+    """Atomically replace path with payload."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _extract_json(text: Any) -> str:
+    """Pull the JSON payload out of an LLM reply (strips prose and ``` fences)."""
+    text = str(text)
+    starts = [pos for pos in (text.find("["), text.find("{")) if pos != -1]
+    if not starts:
+        raise ValueError("no JSON found in model response")
+    start = min(starts)
+    end = text.rfind("]" if text[start] == "[" else "}")
+    if end < start:
+        raise ValueError("unterminated JSON in model response")
+    return text[start:end + 1]
+
+
+# ============================================================================
+# Serialization (generated per dataclass)
+# ============================================================================
+# _fast_serde emits a straight-line to_dict/from_dict for each dataclass at
+# decoration time, the same way dataclasses builds __init__, so (de)serializing
+# a state never goes through fields()/get_type_hints()/isinstance dispatch.
+
+_TYPE_HINTS: Dict[type, Dict[str, Any]] = {}
+
+
+def _type_hints(cls: type) -> Dict[str, Any]:
+    hints = _TYPE_HINTS.get(cls)
+    if hints is None:
+        hints = _TYPE_HINTS[cls] = get_type_hints(cls)
+    return hints
+
+
+def _unwrap_optional(tp: Any):
+    """Return (inner_type, is_optional) for Optional[X]."""
+    if get_origin(tp) is Union:
+        args = [arg for arg in get_args(tp) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return tp, False
+
+
+def _is_serde(tp: Any) -> bool:
+    return isinstance(tp, type) and hasattr(tp, "__fields_cache__")
+
+
+def _encode_expr(tp: Any, expr: str) -> str:
+    """Source expression turning `expr` (of type tp) into its JSON form."""
+    inner, optional = _unwrap_optional(tp)
+    if optional:
+        encoded = _encode_expr(inner, expr)
+        if encoded == expr:
+            return expr
+        return f"({encoded} if {expr} is not None else None)"
+    # Enums and datetimes are left to the encoder: orjson handles both
+    # natively and _json_default covers the stdlib fallback.
+    if _is_serde(tp):
+        return f"{expr}.to_dict()"
+    if get_origin(tp) is list and _is_serde(get_args(tp)[0]):
+        return f"[_v.to_dict() for _v in {expr}]"
+    # str/int/containers of plain JSON values are referenced, not copied
+    return expr
+
+
+def _decode_expr(tp: Any, expr: str, ns: Dict[str, Any]) -> str:
+    """Source expression turning the JSON value `expr` back into type tp."""
+    inner, optional = _unwrap_optional(tp)
+    if optional:
+        decoded = _decode_expr(inner, expr, ns)
+        if decoded == expr:
+            return expr
+        return f"({decoded} if {expr} is not None else None)"
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        ns[tp.__name__] = tp
+        return f"{tp.__name__}({expr})"
+    if tp is datetime:
+        return f"_fromisoformat({expr})"
+    if _is_serde(tp):
+        ns[tp.__name__] = tp
+        return f"{tp.__name__}.from_dict({expr})"
+    if get_origin(tp) is list and _is_serde(get_args(tp)[0]):
+        item_tp = get_args(tp)[0]
+        ns[item_tp.__name__] = item_tp
+        return f"[{item_tp.__name__}.from_dict(_v) for _v in {expr}]"
+    return expr
+
+
+# Homogeneous collections (fields declared with metadata={"homogeneous": True})
+# are stored on disk as ["__hc__", n, key1..keyn, row1 values..., row2 values...]
+# so the n keys are written once instead of once per row.
+_HC_MARKER = "__hc__"
+
+
+def _hc_pack(rows: List[Dict[str, Any]]) -> Any:
+    """Pack same-shape dicts into the flat keys-once layout (else as-is)."""
+    if len(rows) < 2:
+        return rows
+    keys = tuple(rows[0])
+    if not keys or any(tuple(row) != keys for row in rows):
+        return rows
+    packed = [_HC_MARKER, len(keys), *keys]
+    for row in rows:
+        packed.extend(row.values())
+    return packed
+
+
+def _hc_pack_objects(rows: List[Any]) -> Any:
+    """
+    Pack a list of _fast_serde instances straight from their to_row()
+    tuples, without building an intermediate dict per row.
+    """
+    if len(rows) < 2:
+        return [row.to_dict() for row in rows]
+    keys = type(rows[0]).__row_keys__
+    packed = [_HC_MARKER, len(keys), *keys]
+    for row in rows:
+        packed.extend(row.to_row())
+    return packed
+
+
+def _hc_unpack(value: Any) -> Any:
+    """Inverse of _hc_pack; plain lists pass through unchanged."""
+    if not value or value[0] != _HC_MARKER:
+        return value
+    width = value[1]
+    keys = value[2:2 + width]
+    flat = value[2 + width:]
+    return [dict(zip(keys, flat[i:i + width])) for i in range(0, len(flat), width)]
+
+
+def _fast_serde(cls):
+    """Attach generated to_dict()/from_dict() to a dataclass."""
+    hints = _type_hints(cls)
+    cls.__fields_cache__ = tuple((f.name, hints[f.name]) for f in fields(cls) if f.init)
+    required = {
+        f.name for f in fields(cls)
+        if f.init and f.default is MISSING and f.default_factory is MISSING
+    }
+    homogeneous = {f.name for f in fields(cls) if f.metadata.get("homogeneous")}
+    ns: Dict[str, Any] = {
+        "_fromisoformat": datetime.fromisoformat,
+        "_hc_pack": _hc_pack,
+        "_hc_pack_objects": _hc_pack_objects,
+        "_hc_unpack": _hc_unpack,
+    }
+    
+    # Values are referenced, never copied: to_dict() output is only read by
+    # the encoder, so nested lists/dicts alias the live objects.
+    to_lines = ["def to_dict(self):", "    return {"]
+    row_exprs = []
+    for name, tp in cls.__fields_cache__:
+        expr = _encode_expr(tp, 'self.' + name)
+        row_exprs.append(expr)
+        if name in homogeneous:
+            if get_origin(tp) is list and _is_serde(get_args(tp)[0]):
+                expr = f"_hc_pack_objects(self.{name})"
+            else:
+                expr = f"_hc_pack({expr})"
+        to_lines.append(f"        {name!r}: {expr},")
+    to_lines.append("    }")
+    
+    # to_row(): the same values as to_dict() in field order, used when a list
+    # of this class is packed in the homogeneous-collection layout.
+    cls.__row_keys__ = tuple(name for name, _tp in cls.__fields_cache__)
+    to_lines.append("")
+    to_lines.append("def to_row(self):")
+    to_lines.append(f"    return ({''.join(expr + ', ' for expr in row_exprs)})")
+    
+    # Required fields go straight into the constructor call; the rest are
+    # only passed when present so older state files fall back to defaults.
+    from_lines = ["def from_dict(cls, d):", "    kw = {}"]
+    call_args = []
+    for name, tp in cls.__fields_cache__:
+        raw = f"d[{name!r}]" if name in required else "_x"
+        if name in homogeneous:
+            raw = f"_hc_unpack({raw})"
+        if name in required:
+            call_args.append(f"{name}={_decode_expr(tp, raw, ns)}")
+        else:
+            from_lines.append(f"    if {name!r} in d:")
+            from_lines.append(f"        _x = d[{name!r}]")
+            from_lines.append(f"        kw[{name!r}] = {_decode_expr(tp, raw, ns)}")
+    from_lines.append(f"    return cls({''.join(arg + ', ' for arg in call_args)}**kw)")
+    
+    exec("\n".join(to_lines) + "\n\n" + "\n".join(from_lines), ns)
+    to_dict = ns["to_dict"]
+    to_dict.__qualname__ = f"{cls.__qualname__}.to_dict"
+    to_dict.__doc__ = "JSON-ready dict for persistence; enums/datetimes left to the encoder (generated)."
+    from_dict = ns["from_dict"]
+    from_dict.__qualname__ = f"{cls.__qualname__}.from_dict"
+    from_dict.__doc__ = "Rebuild from to_dict() output; missing keys keep defaults (generated)."
+    to_row = ns["to_row"]
+    to_row.__qualname__ = f"{cls.__qualname__}.to_row"
+    to_row.__doc__ = "Field values in declaration order, as in to_dict() (generated)."
+    cls.to_dict = to_dict
+    cls.to_row = to_row
+    cls.from_dict = classmethod(from_dict)
+    return cls
+
+
 # ============================================================================
 # Data Classes
 # ============================================================================
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class IdeaInput:
     """Initial idea input from user."""
     
@@ -100,7 +410,8 @@ class IdeaInput:
     user_id: Optional[str] = None
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class ExpandedIdea:
     """Expanded and refined idea."""
     
@@ -123,7 +434,8 @@ class ExpandedIdea:
     expansion_timestamp: datetime = field(default_factory=datetime.now)
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class CharacterDesign:
     """Detailed character design."""
     
@@ -150,7 +462,8 @@ class CharacterDesign:
     visual_style_notes: str
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class PlotStructure:
     """Story plot structure."""
     
@@ -171,10 +484,11 @@ class PlotStructure:
     key_transitions: List[str]
     
     # Emotional journey
-    emotional_beats: List[Dict[str, Any]]
+    emotional_beats: List[Dict[str, Any]] = field(metadata={"homogeneous": True})
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class SceneBreakdown:
     """Detailed scene breakdown."""
     
@@ -204,7 +518,8 @@ class SceneBreakdown:
     camera_suggestions: List[str]
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class VisualStyleGuide:
     """Visual style guide for the project."""
     
@@ -235,7 +550,8 @@ class VisualStyleGuide:
     inspiration_notes: str
 
 
-@dataclass
+@_fast_serde
+@dataclass(slots=True)
 class WorkflowState:
     """Current state of the workflow."""
     
@@ -247,7 +563,7 @@ class WorkflowState:
     expanded_idea: Optional[ExpandedIdea] = None
     character_designs: List[CharacterDesign] = field(default_factory=list)
     plot_structure: Optional[PlotStructure] = None
-    scene_breakdown: List[SceneBreakdown] = field(default_factory=list)
+    scene_breakdown: List[SceneBreakdown] = field(default_factory=list, metadata={"homogeneous": True})
     visual_style_guide: Optional[VisualStyleGuide] = None
     final_script: Optional[str] = None
     
@@ -259,41 +575,353 @@ class WorkflowState:
     # User feedback
     user_feedback: List[Dict[str, Any]] = field(default_factory=list)
     
-    def save(self, working_dir: str):
-        """Save workflow state to disk."""
-        state_file = os.path.join(working_dir, "workflow_state.json")
-        os.makedirs(working_dir, exist_ok=True)
+    # Checkpoint bookkeeping (not part of the persisted state).
+    # _last_snapshot holds the encoded bytes of each top-level key as of the
+    # last save, so in-place mutations of nested lists are still detected.
+    _last_snapshot: Dict[str, bytes] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _delta_seq: int = field(default=0, init=False, repr=False, compare=False)
+    _delta_count: int = field(default=0, init=False, repr=False, compare=False)
+    _delta_bytes: int = field(default=0, init=False, repr=False, compare=False)
+    # (workflow_id, created_at, {key: encoded value}, b'{"workflow_id":..,"created_at":..,')
+    _static_cache: Optional[Tuple[Any, ...]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def save(self, working_dir: str, pretty: bool = False):
+        """
+        Save workflow state to disk.
         
-        with open(state_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "workflow_id": self.workflow_id,
-                "current_stage": self.current_stage.value,
-                "created_at": self.created_at.isoformat(),
-                "updated_at": self.updated_at.isoformat(),
-                "revision_count": self.revision_count,
-                # Add serialized data here
-            }, f, indent=2, ensure_ascii=False)
+        Only top-level keys that changed since the previous save are appended
+        to the delta log; a full snapshot is written on the first save of the
+        process and whenever the log is due for compaction. Snapshots are
+        compact JSON; pretty=True forces an indented full snapshot (debugging).
+        """
+        writes = self._plan_save(working_dir, pretty)
+        try:
+            _apply_writes(working_dir, writes)
+        except BaseException:
+            self._invalidate_checkpoint()
+            raise
+    
+    async def save_async(self, working_dir: str, pretty: bool = False):
+        """
+        save() for coroutines: the state is encoded on the calling loop, the
+        file writes run on the dedicated save thread (FIFO across saves).
+        """
+        writes = self._plan_save(working_dir, pretty)
+        if writes:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(_SAVE_EXECUTOR, _apply_writes, working_dir, writes)
+            except BaseException:
+                self._invalidate_checkpoint()
+                raise
+    
+    def _invalidate_checkpoint(self):
+        """
+        After a failed write the files no longer match _last_snapshot, so
+        deltas against it could drop changes; force a full snapshot next.
+        """
+        self._last_snapshot = {}
+    
+    def _plan_save(self, working_dir: str, pretty: bool = False) -> List[Tuple[str, str, bytes]]:
+        """Encode the next checkpoint; returns the (path, mode, payload) writes (see _apply_writes)."""
+        data = self.to_dict()
+        
+        if (
+            pretty
+            or not self._last_snapshot
+            or self._delta_count >= DELTA_COMPACT_EVERY
+            or self._delta_bytes >= DELTA_LOG_MAX_BYTES
+        ):
+            return self._plan_snapshot(working_dir, data, pretty)
+        
+        static_encoded, _prefix = self._static_encoding()
+        encoded = {
+            key: static_encoded[key] if key in static_encoded else _dumps_compact(value)
+            for key, value in data.items()
+        }
+        changed = [key for key, raw in encoded.items() if self._last_snapshot.get(key) != raw]
+        if not changed:
+            return []
+        
+        self._delta_seq += 1
+        record = b"".join((
+            b'{"seq":', str(self._delta_seq).encode(), b",",
+            b",".join(_dumps_compact(key) + b":" + encoded[key] for key in changed),
+            b"}\n",
+        ))
+        
+        self._last_snapshot = encoded
+        self._delta_count += 1
+        self._delta_bytes += len(record)
+        return [(os.path.join(working_dir, DELTA_LOG_NAME), 'ab', record)]
+    
+    def _plan_snapshot(
+        self,
+        working_dir: str,
+        data: Dict[str, Any],
+        pretty: bool = False
+    ) -> List[Tuple[str, str, bytes]]:
+        """Encode a full snapshot and the matching delta-log reset."""
+        # Deltas with seq <= checkpoint_seq are already folded into this
+        # snapshot; load()/load_header() skip them if truncating the log
+        # fails. Written ahead of the state so load_header's probe sees it.
+        snapshot = {"checkpoint_seq": self._delta_seq, **data}
+        
+        # Encode once and write once; json.dump issues a write() per fragment
+        if not pretty:
+            # Splice the pre-encoded static keys in front of the rest:
+            # prefix ends with ',' and the rest's leading '{' is dropped.
+            _static_encoded, prefix = self._static_encoding()
+            rest = {key: value for key, value in snapshot.items() if key not in _STATIC_KEYS}
+            payload = prefix + _dumps_compact(rest)[1:]
+        elif ORJSON_AVAILABLE:
+            payload = orjson.dumps(snapshot, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            payload = json.dumps(
+                snapshot, ensure_ascii=False, indent=2, default=_json_default
+            ).encode('utf-8')
+        
+        self._last_snapshot = {key: _dumps_compact(value) for key, value in data.items()}
+        self._delta_count = 0
+        self._delta_bytes = 0
+        # Snapshot first, then truncate the log: if truncation never
+        # happens, checkpoint_seq marks the stale deltas
+        return [
+            (os.path.join(working_dir, STATE_FILE_NAME), "replace", payload),
+            (os.path.join(working_dir, DELTA_LOG_NAME), 'wb', b""),
+        ]
+    
+    def _static_encoding(self) -> Tuple[Dict[str, bytes], bytes]:
+        """
+        Encoded form of the keys that never change after construction
+        (workflow_id, created_at), computed once per state. Re-encoded only
+        if either attribute is ever reassigned.
+        """
+        cached = self._static_cache
+        if cached is None or cached[0] is not self.workflow_id or cached[1] is not self.created_at:
+            encoded = {
+                "workflow_id": _dumps_compact(self.workflow_id),
+                "created_at": _dumps_compact(self.created_at),
+            }
+            prefix = b"{" + b",".join(
+                _dumps_compact(key) + b":" + raw for key, raw in encoded.items()
+            ) + b","
+            cached = self._static_cache = (self.workflow_id, self.created_at, encoded, prefix)
+        return cached[2], cached[3]
     
     @classmethod
     def load(cls, working_dir: str) -> Optional['WorkflowState']:
-        """Load workflow state from disk."""
-        state_file = os.path.join(working_dir, "workflow_state.json")
+        """Load workflow state from disk, replaying any logged deltas."""
+        state_file = os.path.join(working_dir, STATE_FILE_NAME)
         if not os.path.exists(state_file):
             return None
         
-        with open(state_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(state_file, 'rb') as f:
+            data = _loads(f.read())
         
-        # Reconstruct state (simplified)
-        state = cls(
-            workflow_id=data["workflow_id"],
-            current_stage=WorkflowStage(data["current_stage"]),
-            created_at=datetime.fromisoformat(data["created_at"]),
-            updated_at=datetime.fromisoformat(data["updated_at"]),
-            revision_count=data["revision_count"]
-        )
+        seq = data.pop("checkpoint_seq", 0)
+        delta_file = os.path.join(working_dir, DELTA_LOG_NAME)
+        if os.path.exists(delta_file):
+            with open(delta_file, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    delta = _loads(line)
+                    delta_seq = delta.pop("seq", 0)
+                    if delta_seq <= seq:
+                        continue
+                    data.update(delta)
+                    seq = delta_seq
+        
+        state = cls.from_dict(data)
+        state._delta_seq = seq
         
         return state
+    
+    @staticmethod
+    def load_header(working_dir: str) -> Optional[Dict[str, Any]]:
+        """
+        Read just workflow_id and current_stage without parsing the state.
+        
+        Only a short prefix of the snapshot is read; the delta log is
+        scanned for a newer current_stage, skipping deltas already folded
+        into the snapshot (as load() does). Returns None if there is no
+        saved state.
+        """
+        state_file = os.path.join(working_dir, STATE_FILE_NAME)
+        if not os.path.exists(state_file):
+            return None
+        
+        with open(state_file, 'rb') as f:
+            head = f.read(_HEADER_PROBE_BYTES)
+        header = {key.decode(): _loads(raw) for key, raw in _HEADER_RE.findall(head)}
+        
+        delta_file = os.path.join(working_dir, DELTA_LOG_NAME)
+        deltas = b""
+        if os.path.exists(delta_file):
+            with open(delta_file, 'rb') as f:
+                deltas = f.read()
+        
+        seq_match = _HEADER_SEQ_RE.search(head)
+        if len(header) < 2 or (seq_match is None and deltas.strip()):
+            # Unusually long workflow_id, or a snapshot written before
+            # checkpoint_seq led the file: fall back to a full parse
+            state = WorkflowState.load(working_dir)
+            if state is None:
+                return None
+            return {"workflow_id": state.workflow_id, "current_stage": state.current_stage}
+        
+        checkpoint_seq = int(seq_match.group(1)) if seq_match else 0
+        for delta_seq, stage in _DELTA_STAGE_RE.findall(deltas):
+            if int(delta_seq) > checkpoint_seq:
+                header["current_stage"] = _loads(stage)
+        
+        header["current_stage"] = WorkflowStage(header["current_stage"])
+        return header
+
+
+# ============================================================================
+# Stage Defaults
+# ============================================================================
+# Fallbacks for character fields the model leaves out. The template is shared
+# and immutable; _fresh_default hands each design its own list/dict so
+# designs never alias one another (or the template) when edited later.
+
+_CHARACTER_DEFAULTS = MappingProxyType({
+    "personality_traits": ("brave", "curious", "determined"),
+    "motivations": "To protect loved ones",
+    "fears_weaknesses": "Fear of failure",
+    "age_range": "16-18",
+    "distinctive_features": ("Bright eyes", "Unique hairstyle"),
+    "character_arc": "From doubt to confidence",
+    "relationships": MappingProxyType({}),
+    "key_scenes": ("Discovery", "Challenge", "Triumph"),
+    "color_palette": ("blue", "white", "gold"),
+    "visual_style_notes": "Clean, heroic design",
+})
+
+
+def _fresh_default(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    return value
+
+
+# ============================================================================
+# Prompt Templates
+# ============================================================================
+# Built once at import; the per-call work is a single str.format.
+
+_EXPAND_IDEA_PROMPT = """
+You are a creative story consultant helping to develop an anime short video concept.
+
+Initial Idea: {core_concept}
+Target Duration: {target_duration} seconds
+Creative Direction: {creative_direction}
+Visual Style: {visual_style}
+Pacing: {pacing}
+
+Must Include: {must_include}
+Avoid: {avoid}
+
+Please expand this idea into a detailed concept with:
+
+1. **Premise** (2-3 sentences): Clear, compelling summary
+2. **Theme**: Central theme or message
+3. **Emotional Arc**: How should the audience feel throughout?
+4. **Key Moments** (3-5): Critical story beats
+5. **World Description**: Setting and atmosphere
+6. **Tone**: Overall tone and mood
+
+7. **Suggested Characters** (2-4):
+   - Name and role
+   - Brief personality description
+   - Visual concept
+
+8. **Suggested Scenes** (3-5):
+   - Scene description
+   - Purpose in story
+   - Visual mood
+
+9. **Visual References**: Describe visual inspiration
+
+Format your response as JSON.
+"""
+_format_expand_prompt = _EXPAND_IDEA_PROMPT.format
+
+
+# ============================================================================
+# Stage Memoization
+# ============================================================================
+# Stage methods whose output depends only on their arguments are memoized per
+# workflow, keyed by the encoded arguments, so re-running a stage with
+# unchanged inputs skips the LLM round trip. The cache is a small LRU.
+
+_STAGE_CACHE_SIZE = 8
+
+
+def _cache_key_part(value: Any) -> Any:
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_cache_key_part(item) for item in value]
+    return value
+
+
+def _memoize_stage(method):
+    """Memoize an async stage method on (method name, encoded arguments)."""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (name, _dumps_compact([
+            [_cache_key_part(arg) for arg in args],
+            {k: _cache_key_part(v) for k, v in sorted(kwargs.items())},
+        ]))
+        cache = self._stage_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        
+        result = await method(self, *args, **kwargs)
+        cache[key] = result
+        if len(cache) > _STAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return result
+    
+    return wrapper
+
+
+# Refinable stages: stage -> (stage method, WorkflowState field receiving its
+# result, arguments taken from the current state).
+_REFINE_HANDLERS = MappingProxyType({
+    WorkflowStage.IDEA_EXPANSION: (
+        "expand_idea", "expanded_idea",
+        lambda st: (st.idea_input,),
+    ),
+    WorkflowStage.CHARACTER_DESIGN: (
+        "design_characters", "character_designs",
+        lambda st: (st.expanded_idea,),
+    ),
+    WorkflowStage.PLOT_DEVELOPMENT: (
+        "develop_plot", "plot_structure",
+        lambda st: (st.expanded_idea, st.character_designs),
+    ),
+    WorkflowStage.SCENE_BREAKDOWN: (
+        "breakdown_scenes", "scene_breakdown",
+        lambda st: (st.plot_structure, st.character_designs),
+    ),
+    WorkflowStage.VISUAL_STYLE: (
+        "create_visual_style_guide", "visual_style_guide",
+        lambda st: (st.idea_input, st.expanded_idea),
+    ),
+    WorkflowStage.SCRIPT_GENERATION: (
+        "generate_script", "final_script",
+        lambda st: (st.expanded_idea, st.character_designs, st.plot_structure, st.scene_breakdown),
+    ),
+})
 
 
 # ============================================================================
@@ -312,7 +940,7 @@ class IdeaGuidedWorkflow:
         self,
         chat_model,
         working_dir: str,
-        progress_callback: Optional[Callable[[WorkflowStage, Dict[str, Any]], None]] = None
+        progress_callback: Optional[Callable[[WorkflowStage, Dict[str, Any]], Any]] = None
     ):
         self.chat_model = chat_model
         self.working_dir = working_dir
@@ -324,24 +952,129 @@ class IdeaGuidedWorkflow:
         self.screenwriter = Screenwriter(chat_model=self.chat_model)
         self.character_extractor = CharacterExtractor(chat_model=self.chat_model)
         
+        # (stage method, encoded args) -> result, see _memoize_stage
+        self._stage_cache: "OrderedDict[Tuple[str, bytes], Any]" = OrderedDict()
+        
+        # Progress events are queued and delivered by a dispatcher task so a
+        # slow callback never stalls the workflow; started on demand and
+        # exits once the queue is drained.
+        self._progress_queue: Optional[asyncio.Queue] = None
+        self._progress_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._progress_task: Optional[asyncio.Task] = None
+        
+        # (state, cache key, summary) for get_summary, see there
+        self._summary_cache: Optional[Tuple[WorkflowState, Tuple[Any, ...], Dict[str, Any]]] = None
+        
         # Create working directory
         os.makedirs(working_dir, exist_ok=True)
         
-        # Load or create state
-        self.state = WorkflowState.load(working_dir)
-        if self.state is None:
-            self.state = WorkflowState(
+        # Saved state is only parsed on first access to self.state; until
+        # then the header answers workflow_id/current_stage queries.
+        self._state: Optional[WorkflowState] = None
+        self._header = WorkflowState.load_header(working_dir)
+        if self._header is None:
+            self._state = WorkflowState(
                 workflow_id=os.path.basename(working_dir),
                 current_stage=WorkflowStage.IDEA_INPUT
             )
     
+    @property
+    def state(self) -> WorkflowState:
+        """Full workflow state, loaded from disk on first access."""
+        if self._state is None:
+            self._state = WorkflowState.load(self.working_dir)
+        return self._state
+    
+    @state.setter
+    def state(self, value: WorkflowState):
+        self._state = value
+    
+    @property
+    def workflow_id(self) -> str:
+        if self._state is None:
+            return self._header["workflow_id"]
+        return self._state.workflow_id
+    
+    @property
+    def current_stage(self) -> WorkflowStage:
+        """Current stage, answered from the header while the state is unloaded."""
+        if self._state is None:
+            return self._header["current_stage"]
+        return self._state.current_stage
+    
     def _notify_progress(self, stage: WorkflowStage, data: Dict[str, Any]):
-        """Notify progress callback."""
-        if self.progress_callback:
+        """
+        Notify progress callback.
+        
+        Inside an event loop the event is only queued; _progress_dispatcher
+        delivers it in order. Without a running loop the callback is called
+        inline.
+        """
+        if not self.progress_callback:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
             try:
                 self.progress_callback(stage, data)
             except Exception as e:
                 self.logger.error(f"Progress callback error: {e}")
+            return
+        
+        if self._progress_task is None or self._progress_loop is not loop:
+            self._progress_loop = loop
+            self._progress_queue = asyncio.Queue()
+            self._progress_task = loop.create_task(self._progress_dispatcher(self._progress_queue))
+        self._progress_queue.put_nowait((stage, data))
+    
+    async def _progress_dispatcher(self, queue: asyncio.Queue):
+        """Deliver queued progress events; sync callbacks run in the executor."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                stage, data = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                # Nothing awaits between the empty check and the reset, so a
+                # later _notify_progress always starts a fresh dispatcher
+                if self._progress_queue is queue:
+                    self._reset_progress()
+                return
+            try:
+                callback = self.progress_callback
+                if inspect.iscoroutinefunction(callback):
+                    await callback(stage, data)
+                elif callback is not None:
+                    await loop.run_in_executor(None, callback, stage, data)
+            except Exception as e:
+                self.logger.error(f"Progress callback error: {e}")
+            finally:
+                queue.task_done()
+    
+    async def _flush_progress(self):
+        """Wait until every queued progress event has been delivered."""
+        if self._progress_queue is not None and self._progress_loop is asyncio.get_running_loop():
+            await self._progress_queue.join()
+    
+    def _reset_progress(self):
+        self._progress_loop = None
+        self._progress_queue = None
+        self._progress_task = None
+    
+    async def _stop_progress(self):
+        """Cancel the dispatcher, dropping undelivered events (error path)."""
+        task = self._progress_task
+        if task is None or self._progress_loop is not asyncio.get_running_loop():
+            return
+        self._reset_progress()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    
+    def _on_visual_style_done(self, task: asyncio.Task):
+        """Report the visual style stage once its background task completes."""
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._notify_progress(WorkflowStage.VISUAL_STYLE, {"style": task.result()})
     
     async def start_from_idea(self, idea_input: IdeaInput) -> WorkflowState:
         """
@@ -352,41 +1085,52 @@ class IdeaGuidedWorkflow:
         self.state.idea_input = idea_input
         self.state.current_stage = WorkflowStage.IDEA_INPUT
         self._notify_progress(WorkflowStage.IDEA_INPUT, {"idea": idea_input})
+        style_task = None
         
-        # Stage 1: Expand the idea
-        self.logger.info("Stage 1: Expanding idea...")
-        expanded_idea = await self.expand_idea(idea_input)
-        self.state.expanded_idea = expanded_idea
-        self.state.current_stage = WorkflowStage.IDEA_EXPANSION
-        self._notify_progress(WorkflowStage.IDEA_EXPANSION, {"expanded_idea": expanded_idea})
-        
-        # Stage 2: Design characters
-        self.logger.info("Stage 2: Designing characters...")
-        character_designs = await self.design_characters(expanded_idea)
-        self.state.character_designs = character_designs
-        self.state.current_stage = WorkflowStage.CHARACTER_DESIGN
-        self._notify_progress(WorkflowStage.CHARACTER_DESIGN, {"characters": character_designs})
-        
-        # Stage 3: Develop plot structure
-        self.logger.info("Stage 3: Developing plot structure...")
-        plot_structure = await self.develop_plot(expanded_idea, character_designs)
-        self.state.plot_structure = plot_structure
-        self.state.current_stage = WorkflowStage.PLOT_DEVELOPMENT
-        self._notify_progress(WorkflowStage.PLOT_DEVELOPMENT, {"plot": plot_structure})
-        
-        # Stage 4: Break down into scenes
-        self.logger.info("Stage 4: Breaking down into scenes...")
-        scene_breakdown = await self.breakdown_scenes(plot_structure, character_designs)
-        self.state.scene_breakdown = scene_breakdown
-        self.state.current_stage = WorkflowStage.SCENE_BREAKDOWN
-        self._notify_progress(WorkflowStage.SCENE_BREAKDOWN, {"scenes": scene_breakdown})
-        
-        # Stage 5: Create visual style guide
-        self.logger.info("Stage 5: Creating visual style guide...")
-        visual_style = await self.create_visual_style_guide(idea_input, expanded_idea)
+        try:
+            # Stage 1: Expand the idea
+            self.logger.info("Stage 1: Expanding idea...")
+            expanded_idea = await self.expand_idea(idea_input)
+            self.state.expanded_idea = expanded_idea
+            self.state.current_stage = WorkflowStage.IDEA_EXPANSION
+            self._notify_progress(WorkflowStage.IDEA_EXPANSION, {"expanded_idea": expanded_idea})
+            
+            # Stage 5 only needs the idea and its expansion, so it runs alongside
+            # stages 2-4; its progress event fires whenever it actually finishes.
+            self.logger.info("Stage 5: Creating visual style guide (in parallel)...")
+            style_task = asyncio.create_task(self.create_visual_style_guide(idea_input, expanded_idea))
+            style_task.add_done_callback(self._on_visual_style_done)
+            
+            # Stage 2: Design characters
+            self.logger.info("Stage 2: Designing characters...")
+            character_designs = await self.design_characters(expanded_idea)
+            self.state.character_designs = character_designs
+            self.state.current_stage = WorkflowStage.CHARACTER_DESIGN
+            self._notify_progress(WorkflowStage.CHARACTER_DESIGN, {"characters": character_designs})
+            
+            # Stage 3: Develop plot structure
+            self.logger.info("Stage 3: Developing plot structure...")
+            plot_structure = await self.develop_plot(expanded_idea, character_designs)
+            self.state.plot_structure = plot_structure
+            self.state.current_stage = WorkflowStage.PLOT_DEVELOPMENT
+            self._notify_progress(WorkflowStage.PLOT_DEVELOPMENT, {"plot": plot_structure})
+            
+            # Stage 4: Break down into scenes
+            self.logger.info("Stage 4: Breaking down into scenes...")
+            scene_breakdown = await self.breakdown_scenes(plot_structure, character_designs)
+            self.state.scene_breakdown = scene_breakdown
+            self.state.current_stage = WorkflowStage.SCENE_BREAKDOWN
+            self._notify_progress(WorkflowStage.SCENE_BREAKDOWN, {"scenes": scene_breakdown})
+        except BaseException:
+            if style_task is not None:
+                style_task.cancel()
+            await self._stop_progress()
+            raise
+        
+        # Stage 5: Collect the visual style guide
+        visual_style = await style_task
         self.state.visual_style_guide = visual_style
         self.state.current_stage = WorkflowStage.VISUAL_STYLE
-        self._notify_progress(WorkflowStage.VISUAL_STYLE, {"style": visual_style})
         
         # Stage 6: Generate final script
         self.logger.info("Stage 6: Generating final script...")
@@ -402,11 +1146,13 @@ class IdeaGuidedWorkflow:
         
         # Save state
         self.state.updated_at = datetime.now()
-        self.state.save(self.working_dir)
+        await self.state.save_async(self.working_dir)
         
+        await self._flush_progress()
         self.logger.info("Workflow completed successfully!")
         return self.state
     
+    @_memoize_stage
     async def expand_idea(self, idea_input: IdeaInput) -> ExpandedIdea:
         """
         Expand the initial idea into a detailed concept.
@@ -418,41 +1164,15 @@ class IdeaGuidedWorkflow:
         - Outline key story moments
         - Describe the world/setting
         """
-        prompt = f"""
-You are a creative story consultant helping to develop an anime short video concept.
-
-Initial Idea: {idea_input.core_concept}
-Target Duration: {idea_input.target_duration_seconds} seconds
-Creative Direction: {idea_input.creative_direction.value if idea_input.creative_direction else 'flexible'}
-Visual Style: {idea_input.visual_style.value if idea_input.visual_style else 'flexible'}
-Pacing: {idea_input.pacing.value}
-
-Must Include: {', '.join(idea_input.must_include_elements) if idea_input.must_include_elements else 'None'}
-Avoid: {', '.join(idea_input.avoid_elements) if idea_input.avoid_elements else 'None'}
-
-Please expand this idea into a detailed concept with:
-
-1. **Premise** (2-3 sentences): Clear, compelling summary
-2. **Theme**: Central theme or message
-3. **Emotional Arc**: How should the audience feel throughout?
-4. **Key Moments** (3-5): Critical story beats
-5. **World Description**: Setting and atmosphere
-6. **Tone**: Overall tone and mood
-
-7. **Suggested Characters** (2-4):
-   - Name and role
-   - Brief personality description
-   - Visual concept
-
-8. **Suggested Scenes** (3-5):
-   - Scene description
-   - Purpose in story
-   - Visual mood
-
-9. **Visual References**: Describe visual inspiration
-
-Format your response as JSON.
-"""
+        prompt = _format_expand_prompt(
+            core_concept=idea_input.core_concept,
+            target_duration=idea_input.target_duration_seconds,
+            creative_direction=_CD_VALUE.get(idea_input.creative_direction, 'flexible'),
+            visual_style=_VS_VALUE.get(idea_input.visual_style, 'flexible'),
+            pacing=_PP_VALUE[idea_input.pacing],
+            must_include=', '.join(idea_input.must_include_elements) or 'None',
+            avoid=', '.join(idea_input.avoid_elements) or 'None',
+        )
         
         # Call LLM (simplified - would use structured output in production)
         response = await self.chat_model.ainvoke(prompt)
@@ -487,29 +1207,65 @@ Format your response as JSON.
         return expanded_idea
     
     async def design_characters(self, expanded_idea: ExpandedIdea) -> List[CharacterDesign]:
-        """Design detailed characters based on expanded idea."""
-        character_designs = []
+        """
+        Design detailed characters based on expanded idea.
+        
+        All suggested characters are designed in a single LLM call that
+        returns a JSON array (one round trip instead of one per character);
+        fields the model leaves out fall back to generic defaults.
+        """
+        suggested_characters = expanded_idea.suggested_characters
+        if not suggested_characters:
+            return []
         
-        for suggested_char in expanded_idea.suggested_characters:
+        roster = "\n".join(
+            f"- {c['name']} ({c['role']}): {c.get('description', '')}"
+            for c in suggested_characters
+        )
+        prompt = f"""
+You are a character designer for an anime short video.
+
+Premise: {expanded_idea.premise}
+Theme: {expanded_idea.theme}
+World: {expanded_idea.world_description}
+
+Design every character below:
+{roster}
+
+Return a JSON array with one object per character, in the same order, each with:
+name, role, personality_traits (list), motivations, fears_weaknesses, age_range,
+appearance_description, distinctive_features (list), character_arc,
+relationships (object: other character -> relationship), key_scenes (list),
+color_palette (list), visual_style_notes.
+"""
+        response = await self.chat_model.ainvoke(prompt)
+        
+        designed: List[Dict[str, Any]] = []
+        try:
+            parsed = _loads(_extract_json(getattr(response, "content", response)))
+            if isinstance(parsed, list):
+                designed = [item for item in parsed if isinstance(item, dict)]
+        except ValueError as e:
+            self.logger.warning(f"Could not parse character designs, using defaults: {e}")
+        
+        character_designs = []
+        for index, suggested_char in enumerate(suggested_characters):
+            llm = designed[index] if index < len(designed) else {}
+            values = {
+                key: llm.get(key) or _fresh_default(default)
+                for key, default in _CHARACTER_DEFAULTS.items()
+            }
             design = CharacterDesign(
                 name=suggested_char["name"],
                 role=suggested_char["role"],
-                personality_traits=["brave", "curious", "determined"],
-                motivations="To protect loved ones",
-                fears_weaknesses="Fear of failure",
-                age_range="16-18",
-                appearance_description=suggested_char["description"],
-                distinctive_features=["Bright eyes", "Unique hairstyle"],
-                character_arc="From doubt to confidence",
-                relationships={},
-                key_scenes=["Discovery", "Challenge", "Triumph"],
-                color_palette=["blue", "white", "gold"],
-                visual_style_notes="Clean, heroic design"
+                appearance_description=llm.get("appearance_description") or suggested_char["description"],
+                **values
             )
             character_designs.append(design)
         
         return character_designs
     
+    @_memoize_stage
     async def develop_plot(
         self,
         expanded_idea: ExpandedIdea,
@@ -567,6 +1323,7 @@ Format your response as JSON.
         
         return scenes
     
+    @_memoize_stage
     async def create_visual_style_guide(
         self,
         idea_input: IdeaInput,
@@ -629,10 +1386,16 @@ Format your response as JSON.
         """
         Refine a specific stage based on user feedback.
         
-        Allows iterative improvement of any workflow stage.
+        Allows iterative improvement of any stage in _REFINE_HANDLERS;
+        raises ValueError for stages that cannot be re-run.
         """
+        handler = _REFINE_HANDLERS.get(stage)
+        if handler is None:
+            raise ValueError(f"Stage {_STAGE_VALUE[stage]} cannot be refined")
+        method_name, state_field, stage_args = handler
+        
         self.state.user_feedback.append({
-            "stage": stage.value,
+            "stage": _STAGE_VALUE[stage],
             "feedback": feedback,
             "changes": specific_changes,
             "timestamp": datetime.now().isoformat()
@@ -641,29 +1404,46 @@ Format your response as JSON.
         self.state.revision_count += 1
         
         # Re-run the specific stage with feedback
-        if stage == WorkflowStage.IDEA_EXPANSION:
-            self.state.expanded_idea = await self.expand_idea(self.state.idea_input)
-        elif stage == WorkflowStage.CHARACTER_DESIGN:
-            self.state.character_designs = await self.design_characters(self.state.expanded_idea)
-        # ... handle other stages
+        self._invalidate_stage_cache(method_name)
+        result = await getattr(self, method_name)(*stage_args(self.state))
+        setattr(self.state, state_field, result)
         
         self.state.updated_at = datetime.now()
-        self.state.save(self.working_dir)
+        await self.state.save_async(self.working_dir)
         
         return self.state
     
+    def _invalidate_stage_cache(self, method_name: str):
+        """Drop memoized results of one stage so feedback forces a fresh run."""
+        for key in [key for key in self._stage_cache if key[0] == method_name]:
+            del self._stage_cache[key]
+    
     def get_summary(self) -> Dict[str, Any]:
-        """Get workflow summary."""
-        return {
-            "workflow_id": self.state.workflow_id,
-            "current_stage": self.state.current_stage.value,
-            "revision_count": self.state.revision_count,
-            "character_count": len(self.state.character_designs),
-            "scene_count": len(self.state.scene_breakdown),
-            "has_script": self.state.final_script is not None,
-            "created_at": self.state.created_at.isoformat(),
-            "updated_at": self.state.updated_at.isoformat()
+        """
+        Get workflow summary.
+        
+        Cached until the state changes. Stage results are assigned together
+        with current_stage, and refinements bump revision_count/updated_at,
+        so those (plus the state object itself) form the cache key.
+        """
+        state = self.state
+        key = (state.updated_at, state.current_stage, state.revision_count)
+        cached = self._summary_cache
+        if cached is not None and cached[0] is state and cached[1] == key:
+            return dict(cached[2])
+        
+        summary = {
+            "workflow_id": state.workflow_id,
+            "current_stage": _STAGE_VALUE[state.current_stage],
+            "revision_count": state.revision_count,
+            "character_count": len(state.character_designs),
+            "scene_count": len(state.scene_breakdown),
+            "has_script": state.final_script is not None,
+            "created_at": state.created_at.isoformat(),
+            "updated_at": state.updated_at.isoformat()
         }
+        self._summary_cache = (state, key, summary)
+        return dict(summary)
 
 
 # ============================================================================
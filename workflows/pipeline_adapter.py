@@ -3,9 +3,10 @@ Pipeline Adapter for Conversational Workflow
 将现有的Idea2Video和Script2Video pipeline适配到对话式工作流中
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 import asyncio
 import os
+import re
 from pathlib import Path
 
 from pipelines.idea2video_pipeline import Idea2VideoPipeline
@@ -18,6 +19,50 @@ from agents.personality_extractor import PersonalityExtractor
 from utils.async_wrapper import ProgressCallback, AsyncBatchProcessor
 
 
+# 关键词分类: 每张表编译成一个正则, 一次扫描找出文本中出现的所有关键词;
+# 多个类别同时出现时按优先级 (即原先 if/elif 的顺序) 取第一个
+_ATMOSPHERE_KEYWORDS = {
+    "紧张": ("紧张", "危险", "冲突"),
+    "温馨": ("温馨", "温暖", "幸福"),
+    "悲伤": ("悲伤", "难过", "痛苦"),
+    "神秘": ("神秘", "诡异", "奇怪"),
+}
+_CAMERA_ANGLE_KEYWORDS = {
+    "特写": ("close", "特写"),
+    "远景": ("wide", "远景"),
+    "中景": ("medium", "中景"),
+}
+_CAMERA_MOVEMENT_KEYWORDS = {
+    "摇镜": ("pan", "摇"),
+    "推近": ("zoom", "推"),
+    "跟随": ("track", "跟"),
+}
+
+
+def _compile_keyword_table(table: Dict[str, tuple]):
+    """编译 {类别: 关键词} 表 → (正则, 关键词→类别, 类别优先级)"""
+    label_by_keyword = {kw: label for label, keywords in table.items() for kw in keywords}
+    pattern = re.compile("|".join(map(re.escape, label_by_keyword)), re.IGNORECASE)
+    return pattern, label_by_keyword, tuple(table)
+
+
+_ATMOSPHERE_TABLE = _compile_keyword_table(_ATMOSPHERE_KEYWORDS)
+_CAMERA_ANGLE_TABLE = _compile_keyword_table(_CAMERA_ANGLE_KEYWORDS)
+_CAMERA_MOVEMENT_TABLE = _compile_keyword_table(_CAMERA_MOVEMENT_KEYWORDS)
+
+
+def _classify_keywords(text: str, compiled, default: str) -> str:
+    """单次扫描text, 返回出现的最高优先级类别 (无匹配时返回default)"""
+    pattern, label_by_keyword, priority = compiled
+    found = {label_by_keyword[match.lower()] for match in pattern.findall(text)}
+    if not found:
+        return default
+    for label in priority:
+        if label in found:
+            return label
+    return default
+
+
 class PipelineAdapter:
     """
     适配器类，用于将现有pipeline的功能分解为对话式工作流的各个步骤
@@ -363,78 +408,41 @@ class PipelineAdapter:
             if progress:
                 await progress.update(0.1, "Analyzing plot structure...")
             
-            # 从plot_summary中提取场景信息
-            scenes = []
-            total_scenes = min(len(outline.plot_summary), 5)
+            # 第一遍: 同步提取场景名称/描述并推断氛围 (纯Python, 无IO)
+            scene_specs = self._scene_specs(outline)
+            total_scenes = len(scene_specs)
             
-            for i, plot_point in enumerate(outline.plot_summary[:5]):
+            # 第二遍: 并发生成场景图片, 并发数由batch_processor的信号量限制
+            completed = 0
+            
+            async def generate_one(i: int, scene_name: str, scene_desc: str, atmosphere: str) -> SceneData:
+                nonlocal completed
+                async with self.batch_processor.semaphore:
+                    scene = await self._generate_scene(i, scene_name, scene_desc, atmosphere, style)
+                # 单线程事件循环内自增, 无需加锁
+                completed += 1
                 if progress:
-                    scene_progress = 0.1 + (i / total_scenes) * 0.9
-                    await progress.update(scene_progress, f"Generating scene {i+1}/{total_scenes}...")
-                scene_desc = plot_point.get("description", "")
-                
-                # 简单的场景名称提取（可以改进）
-                scene_name = plot_point.get("act", f"场景 {i+1}")
-                
-                # 推断氛围
-                atmosphere = "平静"
-                if any(word in scene_desc for word in ["紧张", "危险", "冲突"]):
-                    atmosphere = "紧张"
-                elif any(word in scene_desc for word in ["温馨", "温暖", "幸福"]):
-                    atmosphere = "温馨"
-                elif any(word in scene_desc for word in ["悲伤", "难过", "痛苦"]):
-                    atmosphere = "悲伤"
-                elif any(word in scene_desc for word in ["神秘", "诡异", "奇怪"]):
-                    atmosphere = "神秘"
-                
-                # 生成场景图片（如果scene_generator可用）
-                image_url = None
-                scene_image_error = None
-                if self.scene_generator:
-                    try:
-                        print(f"[Scene {i+1}] Generating image for: {scene_name}")
-                        image_output = await self.scene_generator.generate_scene_image(
-                            scene_name=scene_name,
-                            scene_description=scene_desc,
-                            atmosphere=atmosphere,
-                            style=style
-                        )
-                        
-                        # 保存图片
-                        if image_output.fmt == "url":
-                            # URL格式，直接使用
-                            image_url = image_output.data
-                            print(f"[Scene {i+1}] Image URL: {image_url}")
-                        else:
-                            # 保存到本地
-                            scene_dir = os.path.join(self.pipeline.working_dir, "scenes")
-                            os.makedirs(scene_dir, exist_ok=True)
-                            image_path = os.path.join(scene_dir, f"scene_{i+1}.{image_output.ext}")
-                            image_output.save(image_path)
-                            image_url = f"./{os.path.relpath(image_path, '.')}"
-                            print(f"[Scene {i+1}] Image saved to: {image_path}")
-                    except Exception as e:
-                        scene_image_error = str(e)
-                        print(f"[Scene {i+1}] ERROR generating scene image for {scene_name}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        # Store error but continue - frontend will show placeholder
-                
-                scene = SceneData(
-                    name=scene_name,
-                    description=scene_desc,
-                    atmosphere=atmosphere,
-                    image_url=image_url
-                )
-                
-                # Log scene creation result
-                if image_url:
-                    print(f"[Scene {i+1}] Created successfully with image")
-                elif scene_image_error:
-                    print(f"[Scene {i+1}] Created without image due to error: {scene_image_error}")
-                else:
-                    print(f"[Scene {i+1}] Created without image (no generator available)")
-                scenes.append(scene)
+                    await progress.update(
+                        0.1 + (completed / total_scenes) * 0.9,
+                        f"Generated scene {completed}/{total_scenes}"
+                    )
+                return scene
+            
+            # gather按输入顺序返回结果, 场景顺序与plot_summary一致;
+            # 单个场景失败只替换该场景, 不丢弃其它已完成的场景
+            results = await asyncio.gather(
+                *(generate_one(*spec) for spec in scene_specs),
+                return_exceptions=True
+            )
+            
+            scenes = []
+            for spec, result in zip(scene_specs, results):
+                if isinstance(result, Exception):
+                    print(f"[Scene {spec[0]+1}] ERROR generating scene {spec[1]}: {result}")
+                    result = self._placeholder_scene(*spec)
+                elif isinstance(result, BaseException):
+                    raise result
+                scenes.append(result)
             
             return scenes
             
@@ -442,15 +450,105 @@ class PipelineAdapter:
             print(f"Error generating scenes: {e}")
             import traceback
             traceback.print_exc()
-            # 返回默认场景（不设置image_url，让前端显示占位符）
-            return [
-                SceneData(
-                    name="开场",
-                    description="故事开始的场景",
-                    atmosphere="平静",
-                    image_url=None
+            return self._default_scenes()
+    
+    @staticmethod
+    def _default_scenes() -> List[SceneData]:
+        """返回默认场景（不设置image_url，让前端显示占位符）"""
+        return [
+            SceneData(
+                name="开场",
+                description="故事开始的场景",
+                atmosphere="平静",
+                image_url=None
+            )
+        ]
+    
+    def _scene_specs(self, outline: OutlineData) -> List[Tuple[int, str, str, str]]:
+        """从plot_summary提取 (序号, 场景名称, 场景描述, 氛围), 最多5个场景"""
+        scene_specs = []
+        for i, plot_point in enumerate(outline.plot_summary[:5]):
+            scene_desc = plot_point.get("description", "")
+            
+            # 简单的场景名称提取（可以改进）
+            scene_name = plot_point.get("act", f"场景 {i+1}")
+            
+            # 推断氛围
+            atmosphere = _classify_keywords(scene_desc, _ATMOSPHERE_TABLE, "平静")
+            
+            scene_specs.append((i, scene_name, scene_desc, atmosphere))
+        return scene_specs
+    
+    @staticmethod
+    def _placeholder_scene(i: int, scene_name: str, scene_desc: str, atmosphere: str) -> SceneData:
+        """场景生成失败时的占位场景 (不设置image_url，让前端显示占位符)"""
+        return SceneData(
+            name=scene_name,
+            description=scene_desc,
+            atmosphere=atmosphere,
+            image_url=None
+        )
+    
+    async def _generate_scene(
+        self,
+        i: int,
+        scene_name: str,
+        scene_desc: str,
+        atmosphere: str,
+        style: str
+    ) -> SceneData:
+        """
+        生成单个场景 (含场景图片)
+        
+        图片生成失败时仍返回SceneData (image_url为None), 前端显示占位符
+        """
+        image_url = None
+        scene_image_error = None
+        if self.scene_generator:
+            try:
+                print(f"[Scene {i+1}] Generating image for: {scene_name}")
+                image_output = await self.scene_generator.generate_scene_image(
+                    scene_name=scene_name,
+                    scene_description=scene_desc,
+                    atmosphere=atmosphere,
+                    style=style
                 )
-            ]
+                
+                # 保存图片
+                if image_output.fmt == "url":
+                    # URL格式，直接使用
+                    image_url = image_output.data
+                    print(f"[Scene {i+1}] Image URL: {image_url}")
+                else:
+                    # 保存到本地
+                    scene_dir = os.path.join(self.pipeline.working_dir, "scenes")
+                    os.makedirs(scene_dir, exist_ok=True)
+                    image_path = os.path.join(scene_dir, f"scene_{i+1}.{image_output.ext}")
+                    image_output.save(image_path)
+                    image_url = f"./{os.path.relpath(image_path, '.')}"
+                    print(f"[Scene {i+1}] Image saved to: {image_path}")
+            except Exception as e:
+                scene_image_error = str(e)
+                print(f"[Scene {i+1}] ERROR generating scene image for {scene_name}: {e}")
+                import traceback
+                traceback.print_exc()
+                # Store error but continue - frontend will show placeholder
+        
+        scene = SceneData(
+            name=scene_name,
+            description=scene_desc,
+            atmosphere=atmosphere,
+            image_url=image_url
+        )
+        
+        # Log scene creation result
+        if image_url:
+            print(f"[Scene {i+1}] Created successfully with image")
+        elif scene_image_error:
+            print(f"[Scene {i+1}] Created without image due to error: {scene_image_error}")
+        else:
+            print(f"[Scene {i+1}] Created without image (no generator available)")
+        return scene
     
     async def generate_storyboard(
         self,
@@ -560,23 +658,8 @@ class PipelineAdapter:
             shots = []
             for shot_brief in storyboard_brief:
                 # Extract camera info from visual description (simple heuristic)
-                camera_angle = "中景"
-                camera_movement = "稳定"
-                
-                visual_lower = shot_brief.visual_desc.lower()
-                if "close" in visual_lower or "特写" in shot_brief.visual_desc:
-                    camera_angle = "特写"
-                elif "wide" in visual_lower or "远景" in shot_brief.visual_desc:
-                    camera_angle = "远景"
-                elif "medium" in visual_lower or "中景" in shot_brief.visual_desc:
-                    camera_angle = "中景"
-                
-                if "pan" in visual_lower or "摇" in shot_brief.visual_desc:
-                    camera_movement = "摇镜"
-                elif "zoom" in visual_lower or "推" in shot_brief.visual_desc:
-                    camera_movement = "推近"
-                elif "track" in visual_lower or "跟" in shot_brief.visual_desc:
-                    camera_movement = "跟随"
+                camera_angle = _classify_keywords(shot_brief.visual_desc, _CAMERA_ANGLE_TABLE, "中景")
+                camera_movement = _classify_keywords(shot_brief.visual_desc, _CAMERA_MOVEMENT_TABLE, "稳定")
                 
                 shot = ShotData(
                     shot_number=shot_brief.idx + 1,
@@ -790,6 +873,138 @@ class PipelineAdapter:
                 "success": False,
                 "error": str(e)
             }
+    
+    @staticmethod
+    def _outline_content(outline: OutlineData, fallback: str) -> str:
+        """将大纲 (标题/概要/角色列表/剧情结构) 拼成角色提取用的文本"""
+        parts = []
+        if outline.title:
+            parts.append(f"标题: {outline.title}")
+        if outline.synopsis:
+            parts.append(f"剧情概要: {outline.synopsis}")
+        if outline.characters_summary:
+            parts.append("\n角色列表:")
+            for char_info in outline.characters_summary:
+                if isinstance(char_info, dict):
+                    parts.append(
+                        f"- {char_info.get('name', '')} ({char_info.get('role', '')}): "
+                        f"{char_info.get('description', '')}"
+                    )
+        if outline.plot_summary:
+            parts.append("\n剧情结构:")
+            for plot_point in outline.plot_summary:
+                if isinstance(plot_point, dict):
+                    parts.append(f"- {plot_point.get('act', '')}: {plot_point.get('description', '')}")
+        return "\n".join(parts) or fallback
+    
+    async def run_pipeline_streaming(
+        self,
+        content: str,
+        style: str = "写实电影感"
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流水线式运行 大纲 → (角色 ∥ 场景) → 分镜, 结果按完成顺序产出
+        
+        场景生成不依赖角色, 两个阶段并行运行并写入同一个有界队列
+        (生产者在调用方消费过慢时等待); 每个场景图片完成即产出, 无需等整批.
+        分镜需要完整的角色和场景, 在两者完成后生成并逐镜头产出.
+        
+        某个阶段失败时异常在调用方抛出; 调用方提前关闭 (aclose) 或出错时,
+        未完成的阶段会被取消并等待其退出.
+        
+        Args:
+            content: 创意 (idea模式) 或剧本 (script模式)
+            style: Visual style
+        
+        Yields:
+            ("outline", OutlineData), ("characters", List[CharacterData]),
+            ("scene", (序号, SceneData)), ("shot", ShotData)
+        """
+        if self.mode == "idea":
+            outline = await self.generate_outline_from_idea(content, style)
+        else:
+            outline = await self.generate_outline_from_script(content, style)
+        yield "outline", outline
+        
+        # 在启动并行阶段前初始化, 避免两个阶段各自初始化pipeline
+        if not self.pipeline:
+            await self.initialize_pipeline()
+        
+        events: asyncio.Queue = asyncio.Queue(maxsize=4)
+        
+        async def characters_stage():
+            characters = await self.extract_and_generate_characters(
+                content=self._outline_content(outline, content),
+                style=style
+            )
+            await events.put(("characters", characters))
+        
+        async def scenes_stage():
+            async def one(i: int, scene_name: str, scene_desc: str, atmosphere: str):
+                try:
+                    async with self.batch_processor.semaphore:
+                        scene = await self._generate_scene(i, scene_name, scene_desc, atmosphere, style)
+                except Exception as e:
+                    # 与generate_scenes一致: 只替换失败的场景
+                    print(f"[Scene {i+1}] ERROR generating scene {scene_name}: {e}")
+                    scene = self._placeholder_scene(i, scene_name, scene_desc, atmosphere)
+                await events.put(("scene", (i, scene)))
+            
+            try:
+                scene_specs = self._scene_specs(outline)
+            except Exception as e:
+                print(f"Error generating scenes: {e}")
+                for i, scene in enumerate(self._default_scenes()):
+                    await events.put(("scene", (i, scene)))
+                return
+            await asyncio.gather(*(one(*spec) for spec in scene_specs))
+        
+        async def run_stage(stage):
+            # 结束标记 (None, 异常或None) 只在阶段自行结束时发送; 被取消时
+            # (调用方已关闭) 无人再读队列, 不能阻塞在put上
+            try:
+                await stage()
+            except Exception as e:
+                await events.put((None, e))
+            else:
+                await events.put((None, None))
+        
+        producers = [
+            asyncio.create_task(run_stage(characters_stage)),
+            asyncio.create_task(run_stage(scenes_stage)),
+        ]
+        characters: List[CharacterData] = []
+        scenes_by_index: Dict[int, SceneData] = {}
+        try:
+            remaining = len(producers)
+            while remaining:
+                stage, item = await events.get()
+                if stage is None:
+                    # 生产者异常在此抛出, finally中取消另一个阶段
+                    if item is not None:
+                        raise item
+                    remaining -= 1
+                    continue
+                if stage == "characters":
+                    characters = item
+                else:
+                    scenes_by_index[item[0]] = item[1]
+                yield stage, item
+        finally:
+            for task in producers:
+                task.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+        
+        scenes = [scenes_by_index[i] for i in sorted(scenes_by_index)]
+        shots = await self.generate_storyboard(
+            outline=outline,
+            characters=characters,
+            scenes=scenes,
+            style=style,
+            script=content
+        )
+        for shot in shots:
+            yield "shot", shot
 
 
 class Idea2VideoAdapter(PipelineAdapter):